@@ -0,0 +1,57 @@
+"""
+Email + password authentication.
+
+Emails are matched case-insensitively through the unique index on
+NULLIF(LOWER(email), '') over auth_user (see migration
+0002_unique_user_email), so a login is one indexed lookup and exactly one
+password hash check. Blank emails map to NULL and never clash.
+
+Both backends resolve the signed-in user from accounts.cache.
+"""
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.db.models import EmailField, Func
+from .cache import get_cached_user
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+class EmailKey(Func):
+    """The indexed expression; written out literally so the database can match it to the index."""
+    template = "NULLIF(LOWER(%(expressions)s), '')"
+    output_field = EmailField()
+
+
+def users_with_email(email):
+    """Users whose email matches ``email`` ignoring case (at most one); blank emails never match."""
+    return User.objects.alias(email_key=EmailKey('email')).filter(email_key=normalize_email(email))
+
+
+class CachedUserMixin:
+    """Load the session's user (and profile) through the user cache."""
+
+    def get_user(self, user_id):
+        user = get_cached_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+
+class UsernameBackend(CachedUserMixin, ModelBackend):
+    """ModelBackend (username + password, e.g. the admin) with the cached user loader."""
+
+
+class EmailBackend(CachedUserMixin, ModelBackend):
+    """Authenticate with ``authenticate(request, email=..., password=...)``."""
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if not email or password is None:
+            return None
+        user = users_with_email(email).first()
+        if user is None:
+            # Hash anyway so unknown emails take as long as wrong passwords
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,75 @@
+"""
+Cached user + profile loader for the authentication backends.
+
+AuthenticationMiddleware resolves request.user through the backend's
+get_user() on every request; caching the user together with its profile
+(select_related) means an authenticated request normally needs no user
+or profile query. Entries are dropped whenever the user or the profile is
+saved or deleted (see accounts.models), and expire after
+ACCOUNTS_USER_CACHE_TIMEOUT seconds in case a change bypasses the signals.
+
+The password hash and is_active are never cached: they are read fresh
+with every cached user (one narrow primary-key query), so a password
+change signs out other sessions and a deactivated user is refused at once,
+in every process.
+"""
+import copy
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+
+
+def _cache():
+    return caches[settings.ACCOUNTS_USER_CACHE_ALIAS]
+
+
+def _user_key(user_id):
+    return f'accounts:user:{user_id}'
+
+
+# Read from the database on every request, never from the cache
+FRESH_FIELDS = ('password', 'is_active')
+
+
+def load_user(user_id):
+    return User.objects.select_related('profile').filter(pk=user_id).first()
+
+
+def _cacheable(user):
+    """A copy of ``user`` without the FRESH_FIELDS."""
+    cached = copy.copy(user)
+    for field in FRESH_FIELDS:
+        cached.__dict__.pop(field, None)
+    if User.profile.is_cached(user):
+        # The preloaded profile points back at the user; point it at the copy instead
+        profile = copy.copy(user.profile)
+        User.profile.related.field.set_cached_value(profile, cached)
+        User.profile.related.set_cached_value(cached, profile)
+    return cached
+
+
+def get_cached_user(user_id):
+    """The user with their profile preloaded, or None."""
+    if not settings.ACCOUNTS_USER_CACHE_TIMEOUT:
+        return load_user(user_id)
+
+    cache = _cache()
+    key = _user_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = load_user(user_id)
+        if user is not None:
+            cache.set(key, _cacheable(user), settings.ACCOUNTS_USER_CACHE_TIMEOUT)
+        return user
+
+    fresh = User.objects.filter(pk=user_id).values_list(*FRESH_FIELDS).first()
+    if fresh is None:
+        return None
+    for field, value in zip(FRESH_FIELDS, fresh):
+        setattr(user, field, value)
+    return user
+
+
+def invalidate_cached_user(user_id):
+    _cache().delete(_user_key(user_id))
+
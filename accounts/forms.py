@@ -2,6 +2,7 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from .models import UserProfile
+from .backends import normalize_email, users_with_email
 
 
 class CustomLoginForm(forms.Form):
@@ -27,8 +28,9 @@ class SignUpForm(UserCreationForm):
         fields = ('username', 'email', 'password1', 'password2')
     
     def clean_email(self):
-        email = self.cleaned_data['email']
-        if User.objects.filter(email=email).exists():
+        # Emails are unique ignoring case (see accounts.backends)
+        email = normalize_email(self.cleaned_data['email'])
+        if users_with_email(email).exists():
             raise forms.ValidationError("A user with this email already exists.")
         return email
     
@@ -50,6 +52,12 @@ class UserUpdateForm(forms.ModelForm):
             'first_name': forms.TextInput(attrs={'class': 'form-control'}),
             'last_name': forms.TextInput(attrs={'class': 'form-control'}),
         }
+    
+    def clean_email(self):
+        email = normalize_email(self.cleaned_data['email'])
+        if email and users_with_email(email).exclude(pk=self.instance.pk).exists():
+            raise forms.ValidationError("A user with this email already exists.")
+        return email
 
 
 class UserProfileForm(forms.ModelForm):
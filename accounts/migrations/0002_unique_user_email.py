@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.db import migrations
+from django.db.models import Value
+from django.db.models.functions import Lower
+
+NOTICE_SUBJECT = 'Your Medication Reminder sign-in email has changed'
+NOTICE_BODY = """Hello {username},
+
+Several Medication Reminder accounts were registered with {email}. Email
+addresses now have to be unique, so your account "{username}" signs in with
+
+    {new_email}
+
+from now on. Your password and medications are unchanged, and you can set
+a different email address on your profile page after signing in.
+"""
+
+
+def _with_suffix(email, n):
+    local, at, domain = email.rpartition('@')
+    if not at:
+        return f'{email}+dup{n}'
+    return f'{local}+dup{n}@{domain}'
+
+
+def resolve_duplicate_emails(apps, schema_editor):
+    """
+    Keep each email (ignoring case) on one account only: the oldest (lowest
+    id). The others get a "+dupN" address they can still sign in with, and
+    are told so at their old address. Emails are compared with the
+    database's LOWER(), the expression the unique index below is built on.
+    """
+    User = apps.get_model('auth', 'User')
+    users = User.objects.exclude(email='').annotate(key=Lower('email'))
+    rows = users.values_list('id', 'username', 'email', 'key').order_by('key', 'id')
+
+    renamed = []
+    previous_key = None
+    for user_id, username, email, key in rows:
+        if key != previous_key:
+            previous_key = key
+            continue
+        n = 1
+        while users.filter(key=Lower(Value(_with_suffix(email, n)))).exists():
+            n += 1
+        new_email = _with_suffix(email, n)
+        User.objects.filter(id=user_id).update(email=new_email)
+        renamed.append((username, email, new_email))
+
+    if renamed:
+        send_mass_mail(
+            [
+                (
+                    NOTICE_SUBJECT,
+                    NOTICE_BODY.format(username=username, email=email, new_email=new_email),
+                    settings.DEFAULT_FROM_EMAIL,
+                    [email],
+                )
+                for username, email, new_email in renamed
+            ],
+            fail_silently=True,
+        )
+        print(f'\n  Gave {len(renamed)} accounts with a duplicate email a +dupN address:')
+        for username, email, new_email in renamed:
+            print(f'    {username}: {email} -> {new_email}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(resolve_duplicate_emails, migrations.RunPython.noop),
+        # auth.User belongs to django.contrib.auth, so its index is created here
+        migrations.RunSQL(
+            # Must match accounts.backends.EmailKey for lookups to use it
+            "CREATE UNIQUE INDEX accounts_user_email_key_uniq ON auth_user ((NULLIF(LOWER(email), '')))",
+            "DROP INDEX accounts_user_email_key_uniq",
+        ),
+    ]
@@ -1,7 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from .cache import invalidate_cached_user
 
 
 class UserProfile(models.Model):
@@ -10,6 +11,8 @@ class UserProfile(models.Model):
         ('F', 'Female'),
         ('O', 'Other'),
     ]
+    # Editable fields whose changes are tracked, see changed_fields()
+    PROFILE_FIELDS = ('bio', 'gender', 'age', 'phone_number')
     
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     bio = models.TextField(max_length=500, blank=True, help_text='Tell us about yourself')
@@ -22,21 +25,80 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"{self.user.username}'s Profile"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_saved_values()
+        return instance
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._remember_saved_values()
+    
+    def _remember_saved_values(self):
+        # Deferred fields are not loaded and so cannot have been changed
+        self._saved_values = {
+            field: self.__dict__[field] for field in self.PROFILE_FIELDS if field in self.__dict__
+        }
+    
+    def changed_fields(self):
+        """Profile fields changed since the row was loaded or last saved."""
+        saved = getattr(self, '_saved_values', None)
+        if saved is None:
+            return list(self.PROFILE_FIELDS)
+        return [field for field, value in saved.items() if getattr(self, field) != value]
+    
+    def save_changes(self):
+        """Write only the changed profile fields (the whole row if unsaved); returns whether it wrote."""
+        if self.pk is None:
+            self.save()
+            return True
+        changed = self.changed_fields()
+        if changed:
+            self.save(update_fields=[*changed, 'updated_at'])
+        return bool(changed)
+    
     class Meta:
         verbose_name = 'User Profile'
         verbose_name_plural = 'User Profiles'
 
 
-# Django Signal to automatically create UserProfile when User is created
+def get_user_profile(user):
+    """The user's profile, preloaded when the user came from the user cache; created if missing."""
+    try:
+        return user.profile
+    except UserProfile.DoesNotExist:
+        profile, created = UserProfile.objects.get_or_create(user=user)
+        return profile
+
+
+# Create the profile with the user; afterwards write it only when it was
+# loaded on this user and its fields changed (so e.g. the last_login update
+# at every login no longer rewrites it). Missing profiles of older users are
+# created on first use by get_user_profile()
 @receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
+def save_user_profile(sender, instance, created, **kwargs):
     if created:
         UserProfile.objects.create(user=instance)
+        return
+    
+    if not User.profile.is_cached(instance):
+        return
+    try:
+        profile = instance.profile
+    except UserProfile.DoesNotExist:
+        return
+    profile.save_changes()
 
 
+# Drop the cached user + profile (see accounts.cache) whenever either changes
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
-    else:
-        UserProfile.objects.create(user=instance)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_profile_user_cache(sender, instance, **kwargs):
+    invalidate_cached_user(instance.user_id)
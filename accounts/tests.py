@@ -0,0 +1,153 @@
+from contextlib import redirect_stdout
+from importlib import import_module
+from io import StringIO
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY, BACKEND_SESSION_KEY
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import caches
+from django.db import connection
+from .cache import _user_key
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+class SignUpTests(TestCase):
+
+    def test_signup_logs_the_new_user_in(self):
+        response = self.client.post(reverse('accounts:signup'), {
+            'username': 'newuser',
+            'email': 'New.User@Example.com',
+            'password1': 'a-Strong-passw0rd',
+            'password2': 'a-Strong-passw0rd',
+        })
+
+        self.assertRedirects(response, reverse('medications:medication_list'), fetch_redirect_response=False)
+        user = User.objects.get(username='newuser')
+        self.assertEqual(user.email, 'new.user@example.com')
+        self.assertEqual(self.client.session[SESSION_KEY], str(user.pk))
+        self.assertEqual(self.client.session[BACKEND_SESSION_KEY], 'accounts.backends.EmailBackend')
+
+
+class ExistingSessionTests(TestCase):
+
+    def test_session_signed_in_with_model_backend_stays_valid(self):
+        user = User.objects.create_user('olduser', 'old@example.com', 'a-Strong-passw0rd')
+        self.client.force_login(user, backend='django.contrib.auth.backends.ModelBackend')
+
+        response = self.client.get(reverse('accounts:profile'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['user'], user)
+
+
+@override_settings(ACCOUNTS_USER_CACHE_TIMEOUT=300)
+class UserCacheTests(TestCase):
+
+    def setUp(self):
+        caches[settings.ACCOUNTS_USER_CACHE_ALIAS].clear()
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'a-Strong-passw0rd')
+        self.client.force_login(self.user, backend='accounts.backends.EmailBackend')
+        # Fill the cache
+        self.client.get(reverse('accounts:profile'))
+
+    def test_password_hash_and_is_active_are_not_cached(self):
+        cached = caches[settings.ACCOUNTS_USER_CACHE_ALIAS].get(_user_key(self.user.pk))
+        self.assertEqual(cached.username, 'alice')
+        self.assertNotIn('password', cached.__dict__)
+        self.assertNotIn('is_active', cached.__dict__)
+        self.assertNotIn('password', cached.profile.user.__dict__)
+
+    def test_password_changed_elsewhere_ends_the_session(self):
+        # A queryset update sends no signal, like a change made by another process
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('another-Passw0rd')
+        User.objects.filter(pk=user.pk).update(password=user.password)
+
+        response = self.client.get(reverse('accounts:profile'))
+
+        self.assertRedirects(response, f"{reverse('accounts:login')}?next={reverse('accounts:profile')}",
+                             fetch_redirect_response=False)
+
+    def test_profile_edits_do_not_write_back_stale_fields(self):
+        User.objects.filter(pk=self.user.pk).update(is_staff=True, last_name='Smith')
+
+        self.client.patch(reverse('accounts:patch_profile_api'), {'first_name': 'Alice'}, content_type='application/json')
+        self.client.post(reverse('accounts:edit_profile'), {
+            'username': 'alice', 'email': 'alice@example.com', 'first_name': 'Alice', 'last_name': 'Smith',
+            'bio': '', 'gender': '', 'age': '', 'phone_number': '',
+        })
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.is_staff)
+        self.assertTrue(user.check_password('a-Strong-passw0rd'))
+        self.assertEqual((user.first_name, user.last_name), ('Alice', 'Smith'))
+
+
+class QueryCountTests(TestCase):
+    """Queries per login and per profile edit; a change here usually means a regression."""
+
+    def setUp(self):
+        # Tests roll back and reuse user ids, so start without cached users
+        caches[settings.ACCOUNTS_USER_CACHE_ALIAS].clear()
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'a-Strong-passw0rd')
+
+    def test_login(self):
+        # Email lookup, last_login, and the session insert and update (with their savepoints)
+        with self.assertNumQueries(9):
+            response = self.client.post(reverse('accounts:login'), {
+                'email': 'Alice@Example.com',
+                'password': 'a-Strong-passw0rd',
+            })
+        self.assertRedirects(response, reverse('medications:medication_list'), fetch_redirect_response=False)
+
+    def test_edit_profile(self):
+        self.client.force_login(self.user, backend='accounts.backends.EmailBackend')
+        # Session, user with profile, the two uniqueness checks, and one write each for
+        # the profile and the user
+        with self.assertNumQueries(6):
+            response = self.client.post(reverse('accounts:edit_profile'), {
+                'username': 'alice',
+                'email': 'alice@example.com',
+                'first_name': 'Alice',
+                'last_name': '',
+                'bio': 'Hello',
+                'gender': '',
+                'age': '',
+                'phone_number': '',
+            })
+        self.assertRedirects(response, reverse('accounts:profile'), fetch_redirect_response=False)
+        self.assertEqual(User.objects.get(pk=self.user.pk).profile.bio, 'Hello')
+
+    def test_patch_profile_api(self):
+        self.client.force_login(self.user, backend='accounts.backends.EmailBackend')
+        # Session, user with profile, and the user update; the unchanged profile is not written
+        with self.assertNumQueries(3):
+            response = self.client.patch(
+                reverse('accounts:patch_profile_api'), {'first_name': 'Alice'}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(User.objects.get(pk=self.user.pk).first_name, 'Alice')
+
+
+class DuplicateEmailMigrationTests(TestCase):
+
+    def test_oldest_account_keeps_the_email_and_the_others_are_told(self):
+        migration = import_module('accounts.migrations.0002_unique_user_email')
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX accounts_user_email_key_uniq')
+        oldest = User.objects.create_user('first', 'Sam@Example.com')
+        second = User.objects.create_user('second', 'sam@example.com')
+        third = User.objects.create_user('third', 'SAM@example.COM')
+        taken = User.objects.create_user('taken', 'sam+dup1@example.com')
+
+        with redirect_stdout(StringIO()):
+            migration.resolve_duplicate_emails(apps, None)
+
+        emails = dict(User.objects.values_list('username', 'email'))
+        self.assertEqual(emails['first'], 'Sam@example.com')
+        self.assertEqual(emails['second'], 'sam+dup2@example.com')
+        self.assertEqual(emails['third'], 'SAM+dup3@example.com')
+        self.assertEqual(emails['taken'], 'sam+dup1@example.com')
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['SAM@example.com', 'sam@example.com'])
@@ -10,7 +10,9 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import UpdateView
 from django.urls import reverse_lazy
 from .forms import SignUpForm, CustomLoginForm, UserUpdateForm, UserProfileForm
-from .models import UserProfile
+from .models import UserProfile, get_user_profile
+from .backends import normalize_email, users_with_email
+from medications.routing import use_read_replica
 import json
 
 
@@ -24,24 +26,14 @@ def custom_login_view(request):
             email = form.cleaned_data['email']
             password = form.cleaned_data['password']
             
-            try:
-                # Handle multiple users with same email - get the first one that matches password
-                users = User.objects.filter(email=email)
-                authenticated_user = None
-                
-                for user in users:
-                    if user.check_password(password):
-                        authenticated_user = user
-                        break
-                
-                if authenticated_user:
-                    login(request, authenticated_user)
-                    messages.success(request, 'Successfully logged in!')
-                    return redirect('medications:medication_list')
-                else:
-                    messages.error(request, 'Invalid email or password.')
-                    
-            except User.DoesNotExist:
+            # One indexed, case-insensitive email lookup and one password check (EmailBackend)
+            user = authenticate(request, email=email, password=password)
+            
+            if user is not None:
+                login(request, user)
+                messages.success(request, 'Successfully logged in!')
+                return redirect('medications:medication_list')
+            else:
                 messages.error(request, 'Invalid email or password.')
     else:
         form = CustomLoginForm()
@@ -54,7 +46,8 @@ def signup_view(request):
         form = SignUpForm(request.POST)
         if form.is_valid():
             user = form.save()
-            login(request, user)
+            # Several backends are configured, so name the one the new account signs in with
+            login(request, user, backend='accounts.backends.EmailBackend')
             messages.success(request, 'Account created successfully!')
             return redirect('medications:medication_list')
     else:
@@ -67,20 +60,21 @@ class CustomLogoutView(LogoutView):
 
 
 @login_required
+@use_read_replica
 def profile_view(request):
     """Display user profile"""
-    profile, created = UserProfile.objects.get_or_create(user=request.user)
+    profile = get_user_profile(request.user)
     
     # Get medication statistics
-    from medications.models import Medication
-    user_medications = Medication.objects.filter(user=request.user)
+    from medications.statistics import get_medication_statistics
+    stats = get_medication_statistics(request.user)
     
     context = {
         'user': request.user,
         'profile': profile,
-        'total_medications': user_medications.count(),
-        'pending_medications_count': user_medications.filter(status='pending').count(),
-        'taken_medications_count': user_medications.filter(status='taken').count(),
+        'total_medications': stats['total'],
+        'pending_medications_count': stats['pending'],
+        'taken_medications_count': stats['taken'],
     }
     return render(request, 'accounts/profile.html', context)
 
@@ -88,15 +82,17 @@ def profile_view(request):
 @login_required
 def edit_profile_view(request):
     """Edit user profile with forms"""
-    profile, created = UserProfile.objects.get_or_create(user=request.user)
+    profile = get_user_profile(request.user)
     
     if request.method == 'POST':
         user_form = UserUpdateForm(request.POST, instance=request.user)
         profile_form = UserProfileForm(request.POST, instance=profile)
         
         if user_form.is_valid() and profile_form.is_valid():
-            user_form.save()
+            # Profile first, so saving the user finds it clean and does not write it again.
+            # Only the form's fields are written: request.user may come from the user cache
             profile_form.save()
+            user_form.save(commit=False).save(update_fields=UserUpdateForm.Meta.fields)
             messages.success(request, 'Your profile has been updated successfully!')
             return redirect('accounts:profile')
     else:
@@ -115,14 +111,18 @@ def edit_profile_view(request):
 def patch_profile_api(request):
     """API endpoint to update specific profile fields using PATCH method"""
     try:
-        profile, created = UserProfile.objects.get_or_create(user=request.user)
+        profile = get_user_profile(request.user)
         data = json.loads(request.body)
         
+        if 'email' in data:
+            data['email'] = normalize_email(data['email'])
+            if data['email'] and users_with_email(data['email']).exclude(pk=request.user.pk).exists():
+                return JsonResponse({'status': 'error', 'message': 'A user with this email already exists.'}, status=400)
+        
         # Update User fields
-        user_fields = ['username', 'email', 'first_name', 'last_name']
+        user_fields = [field for field in ['username', 'email', 'first_name', 'last_name'] if field in data]
         for field in user_fields:
-            if field in data:
-                setattr(request.user, field, data[field])
+            setattr(request.user, field, data[field])
         
         # Update Profile fields
         profile_fields = ['bio', 'gender', 'age', 'phone_number']
@@ -130,9 +130,11 @@ def patch_profile_api(request):
             if field in data:
                 setattr(profile, field, data[field])
         
-        # Save changes
-        request.user.save()
-        profile.save()
+        # Save changes; the profile row is only written if a profile field changed, and
+        # only the given user fields are written (request.user may come from the user cache)
+        profile.save_changes()
+        if user_fields:
+            request.user.save(update_fields=user_fields)
         
         return JsonResponse({
             'status': 'success',
@@ -48,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Inactive unless REQUEST_METRICS_ENABLED; first so it times the whole request
+    'medications.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'medications.routing.ReadYourWritesMiddleware',
 ]
 
 ROOT_URLCONF = 'medication_reminder.urls'
@@ -81,14 +84,84 @@ WSGI_APPLICATION = 'medication_reminder.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# SQLite by default. For PostgreSQL (pip install "psycopg[binary]") set
+# DJANGO_DB_ENGINE=django.db.backends.postgresql and DJANGO_DB_NAME, DJANGO_DB_USER,
+# DJANGO_DB_PASSWORD, DJANGO_DB_HOST, DJANGO_DB_PORT
+
+DB_ENGINE = os.getenv('DJANGO_DB_ENGINE', 'django.db.backends.sqlite3')
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'ENGINE': DB_ENGINE,
+        'NAME': os.getenv('DJANGO_DB_NAME', os.fspath(BASE_DIR / 'db.sqlite3')),
+        # Seconds a connection is reused across requests/tasks (0 closes it after each one)
+        'CONN_MAX_AGE': int(os.getenv('DJANGO_DB_CONN_MAX_AGE', '0')),
+        # Check a reused connection is still alive before the first query of a request
+        'CONN_HEALTH_CHECKS': os.getenv('DJANGO_DB_CONN_HEALTH_CHECKS', 'True').lower() in ('1', 'true', 'yes', 'on'),
+    }
+}
+
+if DB_ENGINE == 'django.db.backends.postgresql':
+    DATABASES['default'].update({
+        'USER': os.getenv('DJANGO_DB_USER', ''),
+        'PASSWORD': os.getenv('DJANGO_DB_PASSWORD', ''),
+        'HOST': os.getenv('DJANGO_DB_HOST', 'localhost'),
+        'PORT': os.getenv('DJANGO_DB_PORT', '5432'),
+        'OPTIONS': {
+            'connect_timeout': int(os.getenv('DJANGO_DB_CONNECT_TIMEOUT', '5')),
+        },
+    })
+elif DB_ENGINE == 'django.db.backends.sqlite3':
+    DATABASES['default']['OPTIONS'] = {
+        # Seconds a write waits for the lock before raising "database is locked"
+        'timeout': float(os.getenv('DJANGO_SQLITE_BUSY_TIMEOUT', '20')),
+    }
+
+# Optional read replica used by the read-only endpoints (medications/routing.py). Its
+# settings default to the primary's; set DJANGO_DB_REPLICA_HOST (PostgreSQL) or
+# DJANGO_DB_REPLICA_NAME to enable it. Migrations never run on the replica, so in
+# development point DJANGO_DB_REPLICA_NAME at the primary's SQLite file (or a copy of it)
+if os.getenv('DJANGO_DB_REPLICA_HOST') or os.getenv('DJANGO_DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('DJANGO_DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    if 'HOST' in DATABASES['default']:
+        DATABASES['replica'].update({
+            'HOST': os.getenv('DJANGO_DB_REPLICA_HOST', DATABASES['default']['HOST']),
+            'PORT': os.getenv('DJANGO_DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        })
+DATABASE_READ_REPLICA = 'replica' if 'replica' in DATABASES else None
+DATABASE_ROUTERS = ['medications.routing.ReadReplicaRouter']
+# After a write request the client reads from the primary for this many seconds
+# (keep it above the replication lag); tracked with this cookie
+READ_REPLICA_STICKY_SECONDS = int(os.getenv('READ_REPLICA_STICKY_SECONDS', '10'))
+READ_REPLICA_PIN_COOKIE = 'read_primary'
+
+# Applied to every new SQLite connection (medications/db.py); WAL lets reads run
+# alongside a write, and synchronous=NORMAL is crash-safe in WAL mode
+SQLITE_JOURNAL_MODE = os.getenv('DJANGO_SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.getenv('DJANGO_SQLITE_SYNCHRONOUS', 'NORMAL')
+
+
+# Cache
+# Local memory by default; point at Redis with
+# DJANGO_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# DJANGO_CACHE_LOCATION=redis://localhost:6379/1
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', ''),
     }
 }
 
+# Medication JSON API responses are cached per user for this many seconds
+# (0 disables); time-dependent fields such as overdue counts may lag by up to this long
+MEDICATION_API_CACHE_ALIAS = 'default'
+MEDICATION_API_CACHE_TIMEOUT = int(os.getenv('MEDICATION_API_CACHE_TIMEOUT', '60'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -138,6 +211,26 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Asia/Karachi'
+CELERY_BEAT_SCHEDULE = {
+    'dispatch-due-reminders': {
+        'task': 'medications.tasks.dispatch_due_reminders',
+        'schedule': 60.0,  # every minute
+    },
+    'refresh-adherence-rollups': {
+        'task': 'medications.tasks.refresh_adherence_rollups',
+        'schedule': 300.0,  # every 5 minutes
+    },
+}
+
+# Reminder dispatch: due reminders are fanned out in batches of this size
+REMINDER_DISPATCH_BATCH_SIZE = int(os.getenv('REMINDER_DISPATCH_BATCH_SIZE', '500'))
+# Reminder emails sent over one reused SMTP connection
+REMINDER_EMAIL_BATCH_SIZE = int(os.getenv('REMINDER_EMAIL_BATCH_SIZE', '100'))
+# A reminder claim older than this (seconds) is assumed abandoned and may be re-claimed
+REMINDER_CLAIM_TIMEOUT = int(os.getenv('REMINDER_CLAIM_TIMEOUT', '600'))
+# Pending doses older than this are not reminded (e.g. after scheduler downtime), unless they
+# were created or rescheduled within it after their time had passed
+REMINDER_DISPATCH_LOOKBACK_MINUTES = int(os.getenv('REMINDER_DISPATCH_LOOKBACK_MINUTES', '60'))
 
 # Email Configuration (SMTP)
 EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
@@ -148,7 +241,82 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER or 'webmaster@localhost')
 
+# Medication list/API pagination
+# 'cursor' uses keyset pagination on (scheduled_datetime, id); 'offset' keeps page numbers (COUNT + OFFSET)
+MEDICATION_PAGINATION_MODE = os.getenv('MEDICATION_PAGINATION_MODE', 'cursor')
+# api/list/ returns the full list in 'offset' mode (default, the existing contract); 'cursor'
+# returns pages of page_size with next_cursor (see README)
+MEDICATION_API_PAGINATION_MODE = os.getenv('MEDICATION_API_PAGINATION_MODE', 'offset')
+MEDICATION_API_PAGE_SIZE = int(os.getenv('MEDICATION_API_PAGE_SIZE', '50'))
+MEDICATION_MAX_PAGE_SIZE = int(os.getenv('MEDICATION_MAX_PAGE_SIZE', '200'))
+# Maximum medications or ids accepted by one bulk API request
+MEDICATION_BULK_MAX_ITEMS = int(os.getenv('MEDICATION_BULK_MAX_ITEMS', '500'))
+# Serve the list/detail/statistics API with native async views (run under ASGI, see asgi.py)
+MEDICATION_ASYNC_API_VIEWS = os.getenv('MEDICATION_ASYNC_API_VIEWS', 'False').lower() in ('1', 'true', 'yes', 'on')
+# Server-sent events (api/events/, ASGI only): the in-process broker reaches only this
+# process; use medications.events.RedisBroker when Celery workers or several servers publish
+MEDICATION_EVENTS_BACKEND = os.getenv('MEDICATION_EVENTS_BACKEND', 'medications.events.InProcessBroker')
+MEDICATION_EVENTS_REDIS_URL = os.getenv('MEDICATION_EVENTS_REDIS_URL', CELERY_BROKER_URL)
+MEDICATION_EVENTS_HEARTBEAT_SECONDS = int(os.getenv('MEDICATION_EVENTS_HEARTBEAT_SECONDS', '15'))
+MEDICATION_EVENTS_STREAM_SECONDS = int(os.getenv('MEDICATION_EVENTS_STREAM_SECONDS', '300'))
+# Rows fetched per database round trip by the streaming export
+MEDICATION_EXPORT_CHUNK_SIZE = int(os.getenv('MEDICATION_EXPORT_CHUNK_SIZE', '2000'))
+
+# Recurring schedules: occurrences are expanded on the fly within this rolling window (days)
+MEDICATION_OCCURRENCE_LOOKBACK_DAYS = int(os.getenv('MEDICATION_OCCURRENCE_LOOKBACK_DAYS', '1'))
+MEDICATION_OCCURRENCE_WINDOW_DAYS = int(os.getenv('MEDICATION_OCCURRENCE_WINDOW_DAYS', '7'))
+
+# Adherence analytics: a dose taken within this many minutes of its time counts as on time
+ADHERENCE_ON_TIME_MINUTES = int(os.getenv('ADHERENCE_ON_TIME_MINUTES', '60'))
+# refresh_adherence_rollups recounts days with doses that passed or were taken since its last
+# run, and at least within this window (for late commits); schedule occurrences are tracked
+# per schedule
+ADHERENCE_REFRESH_LOOKBACK_MINUTES = int(os.getenv('ADHERENCE_REFRESH_LOOKBACK_MINUTES', '15'))
+# Longest range (days) the adherence API returns
+ADHERENCE_MAX_DAYS = int(os.getenv('ADHERENCE_MAX_DAYS', '730'))
+
+# Users sign in with their email (accounts.backends.EmailBackend); the admin keeps username login
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.EmailBackend',
+    'accounts.backends.UsernameBackend',
+    # Sessions record the backend that signed them in and are dropped once it is no longer
+    # listed; kept so logins from before the backends above stay valid (they resolve the user
+    # uncached until the next sign-in). Only failed username logins reach it.
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# Sessions: 'django.contrib.sessions.backends.cached_db' reads sessions from the cache and
+# writes through to the database; '...backends.cache' keeps them in the cache only (lost on
+# eviction or restart). Both need a cache shared by all processes, e.g. Redis (see CACHES)
+SESSION_ENGINE = os.getenv('DJANGO_SESSION_ENGINE', 'django.contrib.sessions.backends.db')
+SESSION_CACHE_ALIAS = 'default'
+
+# The signed-in user and their profile are cached for this many seconds (0 disables).
+# Off by default with a per-process cache (locmem, dummy), where a change made by another
+# process would not drop the entry; the password hash and is_active are never cached
+ACCOUNTS_USER_CACHE_ALIAS = 'default'
+_PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+ACCOUNTS_USER_CACHE_TIMEOUT = int(os.getenv(
+    'ACCOUNTS_USER_CACHE_TIMEOUT',
+    '0' if CACHES[ACCOUNTS_USER_CACHE_ALIAS]['BACKEND'] in _PROCESS_LOCAL_CACHES else '300',
+))
+
 # Login/Logout URLs
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/medications/'
 LOGOUT_REDIRECT_URL = '/accounts/login/'
+
+# Request instrumentation (medications/instrumentation.py): per-request query count, SQL and
+# template time and response size as Server-Timing headers and per-URL-name histograms,
+# scraped in Prometheus format from /metrics/ by staff users and the REMOTE_ADDRs listed here.
+# Empty by default: behind a reverse proxy REMOTE_ADDR is the proxy's address for every
+# client, so only list addresses the proxy setup cannot make external clients appear as
+REQUEST_METRICS_ENABLED = os.getenv('REQUEST_METRICS_ENABLED', 'False').lower() in ('1', 'true', 'yes', 'on')
+REQUEST_METRICS_ALLOWED_IPS = [
+    ip.strip() for ip in os.getenv('REQUEST_METRICS_ALLOWED_IPS', '').split(',') if ip.strip()
+]
+if REQUEST_METRICS_ENABLED:
+    TEMPLATES[0]['BACKEND'] = 'medications.instrumentation.InstrumentedDjangoTemplates'
@@ -17,10 +17,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.shortcuts import redirect
+from medications.instrumentation import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('accounts.urls')),
     path('medications/', include('medications.urls')),
+    path('metrics/', metrics_view, name='metrics'),
     path('', lambda request: redirect('accounts:login')),
 ]
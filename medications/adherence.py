@@ -0,0 +1,246 @@
+"""
+Adherence analytics backed by per-user daily rollups.
+
+DailyAdherence keeps one row per user and local day with the number of
+doses that were due, taken on time, taken late and missed. Days are
+recomputed when a dose is edited or deleted, and by the
+refresh_adherence_rollups periodic task once doses pass their time or are
+taken (by taken_at), so reports never scan the full Medication history.
+Schedule occurrences are found through each schedule's next_adherence_at
+mark, so the task only expands schedules that had an occurrence pass.
+Rollups are not touched when cleanup_medications purges old rows, so
+history outlives them.
+"""
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import DailyAdherence, Medication, MedicationSchedule, TaskWatermark
+from .recurrence import expand_occurrence_ranges
+
+ROLLUP_FIELDS = ('due', 'taken_on_time', 'taken_late', 'missed')
+REFRESH_WATERMARK = 'adherence_refresh'
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_current_timezone())
+
+
+def daily_counts(user_id, first_day, last_day, now):
+    """
+    Compute {date: {due, taken_on_time, taken_late, missed}} for the user's
+    doses scheduled between ``first_day`` and ``last_day`` (local dates,
+    inclusive) and no later than ``now``.
+    """
+    start = _day_start(first_day)
+    end = _day_start(last_day + timedelta(days=1))
+    on_time_until = F('scheduled_datetime') + timedelta(minutes=settings.ADHERENCE_ON_TIME_MINUTES)
+    taken = Q(status='taken')
+
+    rows = (
+        Medication.objects
+        .filter(
+            user_id=user_id,
+            scheduled_datetime__gte=start,
+            scheduled_datetime__lt=end,
+            scheduled_datetime__lte=now,
+        )
+        .annotate(day=TruncDate('scheduled_datetime', tzinfo=timezone.get_current_timezone()))
+        .values('day')
+        .annotate(
+            due=Count('id'),
+            taken_on_time=Count('id', filter=taken & Q(taken_at__lte=on_time_until)),
+            taken_late=Count('id', filter=taken & Q(taken_at__gt=on_time_until)),
+            missed=Count('id', filter=Q(status='pending')),
+        )
+        .order_by()
+    )
+    counts = {row['day']: {field: row[field] for field in ROLLUP_FIELDS} for row in rows}
+
+    # Schedule occurrences are only stored once taken; the rest that have passed were missed.
+    # Occurrences before a schedule was created were never due, and a stopped schedule only
+    # counts until it was stopped (its last update).
+    ranges = [
+        (
+            schedule,
+            max(start, schedule.created_at),
+            min(end, now) if schedule.is_active else min(end, now, schedule.updated_at),
+        )
+        for schedule in MedicationSchedule.objects.filter(user_id=user_id, start_date__lt=last_day + timedelta(days=1))
+    ]
+    for occurrence in expand_occurrence_ranges(ranges):
+        day = counts.setdefault(
+            timezone.localdate(occurrence.scheduled_datetime), dict.fromkeys(ROLLUP_FIELDS, 0)
+        )
+        day['due'] += 1
+        day['missed'] += 1
+    return counts
+
+
+def refresh_daily_adherence(user_id, first_day, last_day=None, now=None):
+    """Recompute the user's rollup rows for the local days ``first_day``..``last_day``."""
+    if last_day is None:
+        last_day = first_day
+    if now is None:
+        now = timezone.now()
+    counts = daily_counts(user_id, first_day, last_day, now)
+
+    rows = [DailyAdherence(user_id=user_id, date=day, **values) for day, values in counts.items()]
+    with transaction.atomic():
+        stale = [
+            day for day in DailyAdherence.objects.filter(
+                user_id=user_id, date__gte=first_day, date__lte=last_day
+            ).values_list('date', flat=True)
+            if day not in counts
+        ]
+        for start in range(0, len(stale), 500):
+            DailyAdherence.objects.filter(user_id=user_id, date__in=stale[start:start + 500]).delete()
+        DailyAdherence.objects.bulk_create(
+            rows,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['user', 'date'],
+            update_fields=[*ROLLUP_FIELDS, 'updated_at'],
+        )
+
+
+def refresh_adherence_for(user_id, datetimes, now=None):
+    """Refresh the rollup days of the given dose times (e.g. after a dose is taken or edited)."""
+    for day in sorted({timezone.localdate(value) for value in datetimes if value is not None}):
+        refresh_daily_adherence(user_id, day, now=now)
+
+
+def rebuild_user_adherence(user_id, now=None):
+    """Recompute every rollup day of a user from their first dose (or schedule start) until today."""
+    if now is None:
+        now = timezone.now()
+    first = Medication.objects.filter(user_id=user_id).aggregate(first=Min('scheduled_datetime'))['first']
+    first_days = [timezone.localdate(first)] if first else []
+    first_start = MedicationSchedule.objects.filter(user_id=user_id).aggregate(first=Min('start_date'))['first']
+    if first_start:
+        first_days.append(first_start)
+    if first_days:
+        refresh_daily_adherence(user_id, min(first_days), timezone.localdate(now), now=now)
+
+
+def refresh_due_adherence(now=None):
+    """
+    Refresh the rollup days of doses whose time passed, or that were taken,
+    since the previous run (or within the last ADHERENCE_REFRESH_LOOKBACK_MINUTES,
+    whichever reaches further back), and of schedule occurrences past their
+    schedule's next_adherence_at.
+    Returns the number of users refreshed.
+    """
+    if now is None:
+        now = timezone.now()
+    # The lookback also covers doses taken in transactions that committed after the last run
+    window_start = now - timedelta(minutes=settings.ADHERENCE_REFRESH_LOOKBACK_MINUTES)
+    watermark = TaskWatermark.objects.filter(name=REFRESH_WATERMARK).first()
+    if watermark is not None:
+        window_start = min(window_start, watermark.processed_until)
+
+    passed = {}
+    for user_id, scheduled in Medication.objects.filter(
+        scheduled_datetime__gt=window_start, scheduled_datetime__lte=now
+    ).values_list('user_id', 'scheduled_datetime').order_by():
+        passed.setdefault(user_id, set()).add(timezone.localdate(scheduled))
+    # Mark-taken is a single UPDATE, so taken doses are picked up here by taken_at
+    for user_id, scheduled in Medication.objects.filter(
+        status='taken', taken_at__gt=window_start, taken_at__lte=now
+    ).values_list('user_id', 'scheduled_datetime').order_by():
+        passed.setdefault(user_id, set()).add(timezone.localdate(scheduled))
+    after = now + timedelta(microseconds=1)
+    for schedule in MedicationSchedule.objects.filter(next_adherence_at__lte=now).iterator():
+        # A stopped schedule is counted up to its stop and then needs no further refreshes
+        until = after if schedule.is_active else min(after, schedule.updated_at)
+        mark = schedule.next_occurrence(after) if schedule.is_active else None
+        # Only the run that moves the mark on counts these occurrences
+        advanced = MedicationSchedule.objects.filter(
+            pk=schedule.pk, next_adherence_at=schedule.next_adherence_at
+        ).update(next_adherence_at=mark)
+        if not advanced:
+            continue
+        for when in schedule.occurrence_times(schedule.next_adherence_at, until):
+            passed.setdefault(schedule.user_id, set()).add(timezone.localdate(when))
+
+    for user_id, days in passed.items():
+        refresh_daily_adherence(user_id, min(days), max(days), now=now)
+    TaskWatermark.objects.update_or_create(name=REFRESH_WATERMARK, defaults={'processed_until': now})
+    return len(passed)
+
+
+def _rate(part, whole):
+    return round(part / whole, 4) if whole else None
+
+
+def _summarise(rows):
+    totals = dict.fromkeys(ROLLUP_FIELDS, 0)
+    for row in rows:
+        for field in ROLLUP_FIELDS:
+            totals[field] += row[field]
+    totals['on_time_rate'] = _rate(totals['taken_on_time'], totals['due'])
+    totals['late_rate'] = _rate(totals['taken_late'], totals['due'])
+    totals['missed_rate'] = _rate(totals['missed'], totals['due'])
+    return totals
+
+
+def compute_streaks(rollups):
+    """
+    (current, longest) runs of days on which no due dose was missed.
+    Days without due doses neither extend nor break a streak.
+    """
+    current = longest = 0
+    for _date, due, _on_time, _late, missed in rollups:
+        if missed:
+            current = 0
+        elif due:
+            current += 1
+            longest = max(longest, current)
+    return current, longest
+
+
+def adherence_report(user, days=30, now=None):
+    """
+    Adherence summary, streaks and daily/weekly time series for the last
+    ``days`` local days (including today), read from the rollup table.
+    """
+    if now is None:
+        now = timezone.now()
+    today = timezone.localdate(now)
+    first_day = today - timedelta(days=days - 1)
+
+    rollups = list(
+        DailyAdherence.objects.filter(user=user).order_by('date').values_list('date', *ROLLUP_FIELDS)
+    )
+    current_streak, longest_streak = compute_streaks(rollups)
+
+    by_day = {row[0]: dict(zip(ROLLUP_FIELDS, row[1:])) for row in rollups if row[0] >= first_day}
+    daily = []
+    weekly = {}
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        values = by_day.get(day, dict.fromkeys(ROLLUP_FIELDS, 0))
+        daily.append({'date': day.isoformat(), **values})
+
+        week = weekly.setdefault(day - timedelta(days=day.weekday()), dict.fromkeys(ROLLUP_FIELDS, 0))
+        for field in ROLLUP_FIELDS:
+            week[field] += values[field]
+
+    summary = _summarise(daily)
+    summary.update({
+        'days': days,
+        'missed_per_day': round(summary['missed'] / days, 4),
+        'missed_per_week': round(summary['missed'] * 7 / days, 4),
+        'current_streak': current_streak,
+        'longest_streak': longest_streak,
+    })
+    return {
+        'summary': summary,
+        'daily': daily,
+        'weekly': [
+            {'week_start': week_start.isoformat(), **values, 'on_time_rate': _rate(values['taken_on_time'], values['due'])}
+            for week_start, values in weekly.items()
+        ],
+    }
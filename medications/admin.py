@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Medication
+from .models import DailyAdherence, Medication, MedicationSchedule, ReminderDelivery
 
 @admin.register(Medication)
 class MedicationAdmin(admin.ModelAdmin):
@@ -7,3 +7,26 @@ class MedicationAdmin(admin.ModelAdmin):
     list_filter = ['status', 'created_at', 'scheduled_datetime']
     search_fields = ['name', 'user__username']
     ordering = ['-scheduled_datetime']
+
+
+@admin.register(MedicationSchedule)
+class MedicationScheduleAdmin(admin.ModelAdmin):
+    list_display = ['name', 'user', 'times_of_day', 'start_date', 'end_date', 'is_active', 'next_reminder_at']
+    list_filter = ['is_active', 'start_date']
+    search_fields = ['name', 'user__username']
+    readonly_fields = ['next_reminder_at']
+
+
+@admin.register(ReminderDelivery)
+class ReminderDeliveryAdmin(admin.ModelAdmin):
+    list_display = ['medication', 'schedule', 'scheduled_datetime', 'status', 'claimed_at', 'sent_at']
+    list_filter = ['status']
+    readonly_fields = ['claimed_at', 'sent_at']
+
+
+@admin.register(DailyAdherence)
+class DailyAdherenceAdmin(admin.ModelAdmin):
+    list_display = ['user', 'date', 'due', 'taken_on_time', 'taken_late', 'missed']
+    list_filter = ['date']
+    search_fields = ['user__username']
+    readonly_fields = ['updated_at']
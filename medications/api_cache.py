@@ -0,0 +1,92 @@
+"""
+Per-user versioned cache for the medication JSON API.
+
+Every cached payload key embeds the user's current version, so bumping the
+version invalidates all of that user's entries at once; the old entries
+simply expire.
+
+Inside @use_read_replica views entries are built from the replica. A client
+that has just written is pinned to the primary (see medications.routing) and
+bypasses the cache: an entry under the version its write created may have
+been built from a replica that had not caught up yet.
+"""
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+from .routing import reads_pinned
+
+
+def _cache():
+    return caches[settings.MEDICATION_API_CACHE_ALIAS]
+
+
+def _version_key(user_id):
+    return f'medications:api:version:{user_id}'
+
+
+def get_user_cache_version(user_id):
+    cache = _cache()
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock so a lost version key never revives old entries
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key, 0)
+    return version
+
+
+def bump_user_cache_version(user_id):
+    """Invalidate every cached API payload of a user."""
+    cache = _cache()
+    key = _version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def cached_api_payload(user_id, name, build, *params):
+    """
+    Return the cached payload for (user, endpoint name, params), calling
+    ``build()`` on a miss. A ``None`` result (e.g. not found) is not cached.
+    Requests pinned to the primary always call ``build()`` and store nothing.
+    """
+    if not settings.MEDICATION_API_CACHE_TIMEOUT or reads_pinned():
+        return build()
+
+    cache = _cache()
+    digest = hashlib.md5(repr(params).encode()).hexdigest()
+    key = f'medications:api:{user_id}:{get_user_cache_version(user_id)}:{name}:{digest}'
+    payload = cache.get(key)
+    if payload is None:
+        payload = build()
+        if payload is not None:
+            cache.set(key, payload, settings.MEDICATION_API_CACHE_TIMEOUT)
+    return payload
+
+
+async def aget_user_cache_version(user_id):
+    cache = _cache()
+    key = _version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key, 0)
+    return version
+
+
+async def acached_api_payload(user_id, name, build, *params):
+    """Async counterpart of cached_api_payload(); ``build`` is a coroutine function."""
+    if not settings.MEDICATION_API_CACHE_TIMEOUT or reads_pinned():
+        return await build()
+
+    cache = _cache()
+    digest = hashlib.md5(repr(params).encode()).hexdigest()
+    key = f'medications:api:{user_id}:{await aget_user_cache_version(user_id)}:{name}:{digest}'
+    payload = await cache.aget(key)
+    if payload is None:
+        payload = await build()
+        if payload is not None:
+            await cache.aset(key, payload, settings.MEDICATION_API_CACHE_TIMEOUT)
+    return payload
@@ -0,0 +1,108 @@
+"""
+ETag / Last-Modified support for the medication JSON API.
+
+The fingerprint of a user's medications (row count + latest updated_at) is
+cached under the user's API cache version, so answering a conditional GET
+with 304 normally needs no SQL at all.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from .api_cache import (
+    acached_api_payload, aget_user_cache_version, cached_api_payload, get_user_cache_version
+)
+from .models import Medication
+
+
+def _fingerprint_query(user_id):
+    return Medication.objects.filter(user_id=user_id), {
+        'count': Count('id'),
+        'last_updated': Max('updated_at'),
+    }
+
+
+def _fingerprint_payload(aggregate):
+    last_updated = aggregate['last_updated']
+    return {
+        'count': aggregate['count'],
+        'last_updated': last_updated.timestamp() if last_updated else 0,
+        'built_at': time.time(),
+    }
+
+
+def _validators(request, version, fingerprint):
+    # Overdue flags and counters change with time alone, so validators
+    # also roll over every cache window
+    window = settings.MEDICATION_API_CACHE_TIMEOUT or 60
+    bucket = int(time.time() // window)
+
+    raw = ':'.join(str(part) for part in (
+        request.user.id,
+        version,
+        fingerprint['count'],
+        fingerprint['last_updated'],
+        bucket,
+        request.get_full_path(),
+    ))
+    return {
+        'etag': hashlib.md5(raw.encode()).hexdigest(),
+        'last_modified': datetime.fromtimestamp(
+            max(fingerprint['built_at'], bucket * window), tz=dt_timezone.utc
+        ),
+    }
+
+
+def _fingerprint(request):
+    # etag_func and last_modified_func are called separately; compute once per request
+    if not hasattr(request, '_medication_fingerprint'):
+        user_id = request.user.id
+
+        def build():
+            queryset, aggregates = _fingerprint_query(user_id)
+            return _fingerprint_payload(queryset.aggregate(**aggregates))
+
+        fingerprint = cached_api_payload(user_id, 'fingerprint', build)
+        request._medication_fingerprint = _validators(request, get_user_cache_version(user_id), fingerprint)
+    return request._medication_fingerprint
+
+
+def medication_etag(request, *args, **kwargs):
+    return _fingerprint(request)['etag']
+
+
+def medication_last_modified(request, *args, **kwargs):
+    return _fingerprint(request)['last_modified']
+
+
+async def aconditional_response(request):
+    """
+    Async counterpart of the @condition decorator for async views.
+    Returns (response, validators): a 304/412 response when the request's
+    preconditions settle it (else None), and the validators to set on the
+    full response with set_validators().
+    """
+    user_id = request.user.id
+
+    async def build():
+        queryset, aggregates = _fingerprint_query(user_id)
+        return _fingerprint_payload(await queryset.aaggregate(**aggregates))
+
+    fingerprint = await acached_api_payload(user_id, 'fingerprint', build)
+    validators = _validators(request, await aget_user_cache_version(user_id), fingerprint)
+    etag = f'"{validators["etag"]}"'
+    last_modified = int(validators['last_modified'].timestamp())
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, validators)
+    return response, validators
+
+
+def set_validators(response, validators):
+    response.headers.setdefault('ETag', f'"{validators["etag"]}"')
+    response.headers.setdefault('Last-Modified', http_date(int(validators['last_modified'].timestamp())))
+    return response
@@ -1,98 +1,362 @@
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import require_http_methods, condition
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.core.serializers import serialize
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import datetime, time, timedelta
 import json
 from .models import Medication
+from .forms import MedicationForm
+from .pagination import CursorPaginator, InvalidCursor, clamp_page_size
+from .statistics import get_medication_statistics
+from .recurrence import pending_occurrences
+from .adherence import adherence_report, refresh_adherence_for
+from .serialization import (
+    FastJsonResponse, medication_values, iter_ndjson, iter_csv, MEDICATION_DETAIL_FIELDS
+)
+from .api_cache import cached_api_payload, bump_user_cache_version
+from .events import publish_event, MARKED_TAKEN, STATS_CHANGED
+from .api_conditional import medication_etag, medication_last_modified
+from .routing import use_read_replica
 
 @login_required
+@use_read_replica
 @require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=medication_etag, last_modified_func=medication_last_modified)
 def api_medications_list(request):
     """
-    API endpoint to get user's medications as JSON
-    Usage: GET /medications/api/list/
+    API endpoint to get user's medications as JSON, newest first
+    Usage: GET /medications/api/list/?page_size=50&cursor=<next_cursor>
     """
-    medications = Medication.objects.filter(user=request.user).order_by('-scheduled_datetime')
+    cursor_mode = settings.MEDICATION_API_PAGINATION_MODE == 'cursor'
+    page_size = clamp_page_size(request.GET.get('page_size'), settings.MEDICATION_API_PAGE_SIZE)
+    cursor = request.GET.get('cursor')
     
-    data = []
-    for med in medications:
-        data.append({
-            'id': med.id,
-            'name': med.name,
-            'dosage': med.dosage,
-            'scheduled_datetime': med.scheduled_datetime.isoformat(),
-            'status': med.status,
-            'is_overdue': med.is_overdue,
-            'created_at': med.created_at.isoformat(),
-        })
+    def build():
+        # Only the serialised columns, as dicts; no model instances
+        medications = medication_values(Medication.objects.filter(user=request.user))
+        page = None
+        
+        if cursor_mode:
+            paginator = CursorPaginator(medications, page_size, descending=True)
+            try:
+                page = paginator.get_page(cursor)
+            except InvalidCursor:
+                return None
+            data = page.object_list
+        else:
+            data = list(medications.order_by('-scheduled_datetime'))
+        
+        payload = {
+            'success': True,
+            'medications': data,
+            'count': len(data)
+        }
+        if page is not None:
+            payload['next_cursor'] = page.next_cursor
+            payload['previous_cursor'] = page.previous_cursor
+        return payload
     
-    return JsonResponse({
-        'success': True,
-        'medications': data,
-        'count': len(data)
-    })
+    params = (cursor, page_size) if cursor_mode else ()
+    payload = cached_api_payload(request.user.id, 'list', build, *params)
+    if payload is None:
+        return JsonResponse({
+            'success': False,
+            'error': 'Invalid cursor'
+        }, status=400)
+    
+    return FastJsonResponse(payload)
 
 @login_required
+@use_read_replica
 @require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=medication_etag, last_modified_func=medication_last_modified)
 def api_medication_detail(request, pk):
     """
     API endpoint to get specific medication details
     Usage: GET /medications/api/detail/<id>/
     """
-    try:
-        medication = Medication.objects.get(pk=pk, user=request.user)
+    def build():
+        data = medication_values(
+            Medication.objects.filter(pk=pk, user=request.user), MEDICATION_DETAIL_FIELDS
+        ).first()
+        if data is None:
+            return None
         
-        data = {
-            'id': medication.id,
-            'name': medication.name,
-            'dosage': medication.dosage,
-            'scheduled_datetime': medication.scheduled_datetime.isoformat(),
-            'status': medication.status,
-            'is_overdue': medication.is_overdue,
-            'created_at': medication.created_at.isoformat(),
-            'updated_at': medication.updated_at.isoformat(),
-        }
-        
-        return JsonResponse({
+        return {
             'success': True,
             'medication': data
-        })
-        
-    except Medication.DoesNotExist:
+        }
+    
+    payload = cached_api_payload(request.user.id, 'detail', build, pk)
+    if payload is None:
         return JsonResponse({
             'success': False,
             'error': 'Medication not found'
         }, status=404)
+    
+    return FastJsonResponse(payload)
 
 @login_required
+@use_read_replica
 @require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=medication_etag, last_modified_func=medication_last_modified)
 def api_statistics(request):
     """
     API endpoint to get user's medication statistics
     Usage: GET /medications/api/statistics/
     """
-    from django.utils import timezone
+    def build():
+        now = timezone.now()
+        statistics = get_medication_statistics(
+            request.user, now=now, occurrences=pending_occurrences(request.user, now=now)
+        )
+        
+        return {
+            'success': True,
+            'statistics': statistics,
+            'timestamp': now.isoformat()
+        }
+    
+    return JsonResponse(cached_api_payload(request.user.id, 'statistics', build))
+
+@login_required
+@require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=medication_etag, last_modified_func=medication_last_modified)
+def api_occurrences(request):
+    """
+    API endpoint to get the not-yet-taken doses of the user's recurring schedules
+    within the rolling occurrence window
+    Usage: GET /medications/api/occurrences/
+    """
+    def build():
+        now = timezone.now()
+        data = []
+        for occurrence in pending_occurrences(request.user, now=now):
+            data.append({
+                'schedule_id': occurrence.schedule_id,
+                'name': occurrence.name,
+                'dosage': occurrence.dosage,
+                'scheduled_datetime': occurrence.scheduled_datetime.isoformat(),
+                'timestamp': int(occurrence.scheduled_datetime.timestamp()),
+                'is_overdue': occurrence.is_overdue,
+            })
+        
+        return {
+            'success': True,
+            'occurrences': data,
+            'count': len(data)
+        }
+    
+    return JsonResponse(cached_api_payload(request.user.id, 'occurrences', build))
+
+@login_required
+@require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=medication_etag, last_modified_func=medication_last_modified)
+def api_adherence(request):
+    """
+    API endpoint to get adherence analytics (on-time/late rates, missed doses,
+    streaks) with daily and weekly series for charts, read from the daily rollups
+    Usage: GET /medications/api/adherence/?days=30
+    """
+    try:
+        days = int(request.GET.get('days', 30))
+    except ValueError:
+        days = 30
+    days = max(1, min(days, settings.ADHERENCE_MAX_DAYS))
+    
+    def build():
+        now = timezone.now()
+        return {
+            'success': True,
+            **adherence_report(request.user, days=days, now=now),
+            'timestamp': now.isoformat()
+        }
+    
+    return JsonResponse(cached_api_payload(request.user.id, 'adherence', build, days))
+
+def _parse_date_param(value):
+    """Parse an optional YYYY-MM-DD query parameter; raises ValueError if malformed."""
+    if not value:
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+def _local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_current_timezone())
+
+@login_required
+@use_read_replica
+@require_http_methods(["GET"])
+def api_export(request):
+    """
+    API endpoint to stream the user's full medication history as NDJSON or CSV
+    Usage: GET /medications/api/export/?format=csv&status=taken&start=2024-01-01&end=2024-12-31
+    ``start``/``end`` are inclusive local dates; all parameters are optional.
+    """
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return JsonResponse({'success': False, 'error': 'format must be "ndjson" or "csv"'}, status=400)
     
     medications = Medication.objects.filter(user=request.user)
-    pending_medications = medications.filter(status='pending')
-    taken_medications = medications.filter(status='taken')
     
-    now = timezone.now()
-    overdue_medications = pending_medications.filter(scheduled_datetime__lt=now)
-    today_medications = pending_medications.filter(
-        scheduled_datetime__date=now.date()
+    status = request.GET.get('status')
+    if status:
+        if status not in dict(Medication.STATUS_CHOICES):
+            return JsonResponse({'success': False, 'error': 'status must be "pending" or "taken"'}, status=400)
+        medications = medications.filter(status=status)
+    
+    try:
+        start = _parse_date_param(request.GET.get('start'))
+        end = _parse_date_param(request.GET.get('end'))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'start and end must be YYYY-MM-DD dates'}, status=400)
+    # Compare against local-midnight bounds so the (user, scheduled_datetime) index is used
+    if start:
+        medications = medications.filter(scheduled_datetime__gte=_local_midnight(start))
+    if end:
+        medications = medications.filter(scheduled_datetime__lt=_local_midnight(end + timedelta(days=1)))
+    
+    # Rows are fetched chunk by chunk and written out as they arrive
+    rows = medication_values(medications, MEDICATION_DETAIL_FIELDS).order_by('scheduled_datetime', 'id').iterator(
+        chunk_size=settings.MEDICATION_EXPORT_CHUNK_SIZE
     )
+    if export_format == 'csv':
+        response = StreamingHttpResponse(iter_csv(rows, MEDICATION_DETAIL_FIELDS), content_type='text/csv')
+    else:
+        response = StreamingHttpResponse(iter_ndjson(rows), content_type='application/x-ndjson')
+    
+    filename = f'medications-{timezone.localdate():%Y%m%d}.{export_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+def _parse_json_body(request):
+    try:
+        return json.loads(request.body), None
+    except (ValueError, UnicodeDecodeError):
+        # JSONDecodeError is a ValueError; a body that is not UTF-8 fails before parsing
+        return None, JsonResponse({'success': False, 'error': 'Invalid JSON data'}, status=400)
+
+def _parse_ids(data):
+    """Return the list of integer ids in ``data['ids']``, or None if malformed/too many."""
+    ids = data.get('ids') if isinstance(data, dict) else None
+    if not isinstance(ids, list) or not ids or len(ids) > settings.MEDICATION_BULK_MAX_ITEMS:
+        return None
+    if not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+        return None
+    return ids
+
+@login_required
+@require_http_methods(["POST"])
+def api_bulk_create(request):
+    """
+    API endpoint to create many medications in one transaction
+    Usage: POST /medications/api/bulk/create/
+    Body: {"medications": [{"name": ..., "dosage": ..., "scheduled_datetime": ...}, ...]}
+    Reminders are picked up by the dispatch_due_reminders scheduler.
+    """
+    data, error = _parse_json_body(request)
+    if error:
+        return error
+    
+    items = data.get('medications') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return JsonResponse({'success': False, 'error': 'Expected a non-empty "medications" list'}, status=400)
+    if len(items) > settings.MEDICATION_BULK_MAX_ITEMS:
+        return JsonResponse({
+            'success': False,
+            'error': f'At most {settings.MEDICATION_BULK_MAX_ITEMS} medications per request'
+        }, status=400)
+    
+    medications = []
+    errors = {}
+    for index, item in enumerate(items):
+        form = MedicationForm(item if isinstance(item, dict) else {})
+        if form.is_valid():
+            medication = form.save(commit=False)
+            medication.user = request.user
+            medications.append(medication)
+        else:
+            errors[index] = form.errors.get_json_data()
+    
+    if errors:
+        return JsonResponse({'success': False, 'error': 'Validation failed', 'errors': errors}, status=400)
+    
+    with transaction.atomic():
+        created = Medication.objects.bulk_create(medications)
+    # bulk_create sends no post_save signals
+    bump_user_cache_version(request.user.id)
+    publish_event(request.user.id, STATS_CHANGED)
     
     return JsonResponse({
         'success': True,
-        'statistics': {
-            'total': medications.count(),
-            'pending': pending_medications.count(),
-            'taken': taken_medications.count(),
-            'overdue': overdue_medications.count(),
-            'today': today_medications.count(),
-        },
-        'timestamp': now.isoformat()
-    })
+        'created': len(created),
+        'ids': [medication.id for medication in created]
+    }, status=201)
+
+@login_required
+@require_http_methods(["POST"])
+def api_bulk_mark_taken(request):
+    """
+    API endpoint to mark many pending medications as taken with one UPDATE
+    Usage: POST /medications/api/bulk/mark-taken/  Body: {"ids": [1, 2, 3]}
+    """
+    data, error = _parse_json_body(request)
+    if error:
+        return error
+    
+    ids = _parse_ids(data)
+    if ids is None:
+        return JsonResponse({
+            'success': False,
+            'error': f'Expected "ids": a list of 1-{settings.MEDICATION_BULK_MAX_ITEMS} integers'
+        }, status=400)
+    
+    # refresh_adherence_rollups picks the doses up by taken_at
+    updated = Medication.objects.filter(user=request.user, id__in=ids).mark_taken()
+    bump_user_cache_version(request.user.id)
+    if updated:
+        publish_event(request.user.id, MARKED_TAKEN, {'medication_ids': ids, 'updated': updated})
+        publish_event(request.user.id, STATS_CHANGED)
+    
+    return JsonResponse({'success': True, 'updated': updated})
+
+@login_required
+@require_http_methods(["POST"])
+def api_bulk_delete(request):
+    """
+    API endpoint to delete many medications in one transaction
+    Usage: POST /medications/api/bulk/delete/  Body: {"ids": [1, 2, 3]}
+    """
+    data, error = _parse_json_body(request)
+    if error:
+        return error
+    
+    ids = _parse_ids(data)
+    if ids is None:
+        return JsonResponse({
+            'success': False,
+            'error': f'Expected "ids": a list of 1-{settings.MEDICATION_BULK_MAX_ITEMS} integers'
+        }, status=400)
+    
+    with transaction.atomic():
+        medications = Medication.objects.filter(user=request.user, id__in=ids)
+        scheduled = list(medications.values_list('scheduled_datetime', flat=True))
+        deleted, per_model = medications.delete()
+    bump_user_cache_version(request.user.id)
+    refresh_adherence_for(request.user.id, scheduled)
+    
+    return JsonResponse({'success': True, 'deleted': per_model.get(Medication._meta.label, 0)})
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MedicationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'medications'
+    
+    def ready(self):
+        # Connect the connection_created receivers that tune SQLite and count queries
+        from . import db, instrumentation  # noqa: F401
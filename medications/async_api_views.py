@@ -0,0 +1,215 @@
+"""
+Native async versions of the read-only medication API endpoints.
+
+They mirror api_views.api_medications_list, api_medication_detail and
+api_statistics but use the async ORM (async iteration, afirst, aaggregate)
+and the async cache API, so under ASGI a request does not occupy a worker
+thread while it waits on the database. Enable them with
+MEDICATION_ASYNC_API_VIEWS (see medications/urls.py).
+
+Django's login_required, require_http_methods, cache_control and condition
+decorators are sync-only in this Django version, hence the small async
+equivalents below.
+
+api_events (server-sent events) is served from here regardless of the
+setting, and only under ASGI.
+"""
+import asyncio
+import functools
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.contrib.auth.views import redirect_to_login
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from .models import Medication
+from .pagination import CursorPaginator, InvalidCursor, clamp_page_size
+from .statistics import aget_medication_statistics
+from .recurrence import apending_occurrences
+from .api_cache import acached_api_payload
+from .api_conditional import aconditional_response, set_validators
+from .serialization import FastJsonResponse, medication_values, MEDICATION_DETAIL_FIELDS
+from .events import get_broker, user_channel
+from .routing import use_read_replica
+
+
+def async_login_required(view):
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        # request.user is a lazy object that loads the session synchronously; resolve it once
+        request.user = await sync_to_async(get_user)(request)
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def async_require_GET(view):
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return HttpResponseNotAllowed(['GET'])
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def async_conditional(view):
+    """Private no-cache responses with ETag/Last-Modified, answering 304 when possible."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        response, validators = await aconditional_response(request)
+        if response is None:
+            response = set_validators(await view(request, *args, **kwargs), validators)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return wrapper
+
+
+@async_login_required
+@use_read_replica
+@async_require_GET
+@async_conditional
+async def api_medications_list(request):
+    """
+    Async API endpoint to get user's medications as JSON, newest first
+    Usage: GET /medications/api/list/?page_size=50&cursor=<next_cursor>
+    """
+    cursor_mode = settings.MEDICATION_API_PAGINATION_MODE == 'cursor'
+    page_size = clamp_page_size(request.GET.get('page_size'), settings.MEDICATION_API_PAGE_SIZE)
+    cursor = request.GET.get('cursor')
+
+    async def build():
+        medications = medication_values(Medication.objects.filter(user=request.user))
+        page = None
+
+        if cursor_mode:
+            paginator = CursorPaginator(medications, page_size, descending=True)
+            try:
+                page = await paginator.aget_page(cursor)
+            except InvalidCursor:
+                return None
+            data = page.object_list
+        else:
+            data = [row async for row in medications.order_by('-scheduled_datetime')]
+
+        payload = {
+            'success': True,
+            'medications': data,
+            'count': len(data)
+        }
+        if page is not None:
+            payload['next_cursor'] = page.next_cursor
+            payload['previous_cursor'] = page.previous_cursor
+        return payload
+
+    params = (cursor, page_size) if cursor_mode else ()
+    payload = await acached_api_payload(request.user.id, 'list', build, *params)
+    if payload is None:
+        return JsonResponse({
+            'success': False,
+            'error': 'Invalid cursor'
+        }, status=400)
+
+    return FastJsonResponse(payload)
+
+@async_login_required
+@use_read_replica
+@async_require_GET
+@async_conditional
+async def api_medication_detail(request, pk):
+    """
+    Async API endpoint to get specific medication details
+    Usage: GET /medications/api/detail/<id>/
+    """
+    async def build():
+        data = await medication_values(
+            Medication.objects.filter(pk=pk, user=request.user), MEDICATION_DETAIL_FIELDS
+        ).afirst()
+        if data is None:
+            return None
+
+        return {
+            'success': True,
+            'medication': data
+        }
+
+    payload = await acached_api_payload(request.user.id, 'detail', build, pk)
+    if payload is None:
+        return JsonResponse({
+            'success': False,
+            'error': 'Medication not found'
+        }, status=404)
+
+    return FastJsonResponse(payload)
+
+@async_login_required
+@use_read_replica
+@async_require_GET
+@async_conditional
+async def api_statistics(request):
+    """
+    Async API endpoint to get user's medication statistics
+    Usage: GET /medications/api/statistics/
+    """
+    async def build():
+        now = timezone.now()
+        statistics = await aget_medication_statistics(
+            request.user, now=now, occurrences=await apending_occurrences(request.user, now=now)
+        )
+
+        return {
+            'success': True,
+            'statistics': statistics,
+            'timestamp': now.isoformat()
+        }
+
+    return JsonResponse(await acached_api_payload(request.user.id, 'statistics', build))
+
+
+async def _event_stream(subscription):
+    """
+    Relay the subscription as text/event-stream frames with keep-alive comments.
+    The stream ends after MEDICATION_EVENTS_STREAM_SECONDS and the browser's
+    EventSource reconnects, so abandoned connections do not linger.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.MEDICATION_EVENTS_STREAM_SECONDS
+    try:
+        yield 'retry: 3000\n\n'
+        while (remaining := deadline - loop.time()) > 0:
+            messages = await subscription.get(timeout=min(settings.MEDICATION_EVENTS_HEARTBEAT_SECONDS, remaining))
+            if not messages:
+                yield ': keep-alive\n\n'
+                continue
+            # Bursts repeat events (e.g. stats_changed for every deleted row); send each once
+            frames = []
+            for message in dict.fromkeys(messages):
+                event = json.loads(message)
+                frames.append(f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n")
+            yield ''.join(frames)
+    finally:
+        subscription.close()
+
+
+@async_login_required
+@async_require_GET
+async def api_events(request):
+    """
+    Server-sent events pushing dose_due, marked_taken and stats_changed for the user
+    Usage: new EventSource('/medications/api/events/')  (ASGI deployments only)
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({
+            'success': False,
+            'error': 'Event stream requires the ASGI server'
+        }, status=501)
+
+    subscription = get_broker().subscribe(user_channel(request.user.id))
+    response = StreamingHttpResponse(_event_stream(subscription), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,109 @@
+"""
+Helpers shared by the benchmark management commands.
+
+The commands seed synthetic users and medications into the configured
+database inside a transaction that is rolled back when they finish, so
+nothing they create is left behind.
+"""
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from .models import Medication
+
+BENCH_USER_PREFIX = 'bench_user_'
+
+
+def create_bench_users(count, start=0):
+    """Bulk-create ``count`` synthetic users (no profile signals fire)."""
+    usernames = [f'{BENCH_USER_PREFIX}{i}' for i in range(start, start + count)]
+    User.objects.bulk_create(
+        [User(username=name, email=f'{name}@example.com') for name in usernames],
+        ignore_conflicts=True,
+    )
+    return list(User.objects.filter(username__in=usernames).order_by('id'))
+
+
+def seed_medications(users, per_user, now=None, span_days=3 * 365, missed_ratio=0.1,
+                     batch_size=5000, seed=42):
+    """
+    Bulk-insert ``per_user`` medications for every user, spread over the last
+    ``span_days`` days plus one week into the future. Past doses are mostly
+    taken; future doses are pending. Returns the number of rows created.
+    """
+    if now is None:
+        now = timezone.now()
+    rng = random.Random(seed)
+    batch = []
+    created = 0
+
+    for user in users:
+        for i in range(per_user):
+            scheduled = now + timedelta(minutes=rng.randint(-span_days * 1440, 7 * 1440))
+            if scheduled > now or rng.random() < missed_ratio:
+                status = 'pending'
+            else:
+                status = 'taken'
+            batch.append(Medication(
+                user=user,
+                name=f'Bench med {i % 20}',
+                dosage='1 tablet',
+                scheduled_datetime=scheduled,
+                status=status,
+            ))
+            if len(batch) >= batch_size:
+                Medication.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+
+    if batch:
+        Medication.objects.bulk_create(batch)
+        created += len(batch)
+
+    # Pretend doses were taken on time
+    Medication.objects.filter(user__in=users, status='taken').update(
+        taken_at=F('scheduled_datetime'), updated_at=F('scheduled_datetime')
+    )
+    return created
+
+
+def timed(func, repeat=5):
+    """Run ``func`` ``repeat`` times and return min/median/max wall time in ms."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'min': samples[0],
+        'median': samples[len(samples) // 2],
+        'max': samples[-1],
+    }
+
+
+def explain(func, label=''):
+    """Return the database query plan of the last SQL statement ``func`` runs."""
+    with CaptureQueriesContext(connection) as ctx:
+        func()
+    if not ctx.captured_queries:
+        return []
+    sql = ctx.captured_queries[-1]['sql']
+    # The label comment keeps SQLite's statement cache from returning a plan
+    # prepared before indexes were dropped
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} /* {label} */ {sql}')
+        return [' '.join(str(col) for col in row) for row in cursor.fetchall()]
+
+
+def percentile(samples, pct):
+    """Nearest-rank ``pct`` percentile of already sorted ``samples``."""
+    if not samples:
+        return 0.0
+    rank = max(1, -(-len(samples) * pct // 100))
+    return samples[int(rank) - 1]
@@ -0,0 +1,22 @@
+"""
+Per-connection database tuning.
+
+SQLite's default rollback journal lets a writer block every reader, so a
+web worker listing medications and a Celery worker marking doses taken
+serialise on the database lock. In WAL mode readers and the single writer
+proceed concurrently, and synchronous=NORMAL (safe with WAL) avoids an
+fsync per commit. Writers that still collide wait up to the busy timeout
+(DATABASES OPTIONS 'timeout') instead of failing with "database is locked".
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA journal_mode = {settings.SQLITE_JOURNAL_MODE}')
+        cursor.execute(f'PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}')
@@ -0,0 +1,34 @@
+from functools import lru_cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+SHELL_TEMPLATE = 'emails/medication_reminder.html'
+CONTENT_TEMPLATE = 'emails/medication_reminder_content.html'
+TEXT_TEMPLATE = 'emails/medication_reminder.txt'
+
+_CONTENT_MARKER = '<!-- reminder-content -->'
+
+
+@lru_cache(maxsize=None)
+def _template(name):
+    # Compiled templates are kept for the lifetime of the worker process
+    return get_template(name)
+
+
+@lru_cache(maxsize=None)
+def _html_shell():
+    """Render the static part of the HTML email once and split it around the content block."""
+    html = _template(SHELL_TEMPLATE).render({'reminder_content': mark_safe(_CONTENT_MARKER)})
+    before, after = html.split(_CONTENT_MARKER)
+    return before, after
+
+
+def render_reminder(context):
+    """
+    Render a medication reminder and return (html_message, text_message).
+    Only the per-medication content block is rendered for each message.
+    """
+    before, after = _html_shell()
+    html_message = before + _template(CONTENT_TEMPLATE).render(context) + after
+    text_message = _template(TEXT_TEMPLATE).render(context)
+    return html_message, text_message
@@ -0,0 +1,180 @@
+"""
+Per-user event channel behind the server-sent events endpoint (api/events/).
+
+Events are published after the surrounding transaction commits:
+
+- ``dose_due`` when dispatch_due_reminders fans out a reminder,
+- ``marked_taken`` when doses are marked as taken,
+- ``stats_changed`` whenever a user's medications change (the same points
+  that invalidate their API cache).
+
+The broker is chosen with MEDICATION_EVENTS_BACKEND. InProcessBroker only
+reaches subscribers in the publishing process, so it suits a single ASGI
+process with eager Celery tasks (development); RedisBroker relays events
+from Celery workers and other server processes through Redis pub/sub.
+"""
+import asyncio
+import json
+import logging
+import threading
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+try:
+    import redis
+    import redis.asyncio
+except ImportError:  # only needed by RedisBroker
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+DOSE_DUE = 'dose_due'
+MARKED_TAKEN = 'marked_taken'
+STATS_CHANGED = 'stats_changed'
+
+CHANNEL_PREFIX = 'medications:events:'
+SUBSCRIPTION_QUEUE_SIZE = 100
+
+
+def user_channel(user_id):
+    return f'{CHANNEL_PREFIX}{user_id}'
+
+
+class Subscription:
+    """Messages published to one channel, queued for a single listener on an event loop."""
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(SUBSCRIPTION_QUEUE_SIZE)
+
+    def _offer(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning(f"Dropping event for slow subscriber on {self.channel}")
+
+    def deliver(self, message):
+        """Queue ``message``; safe to call from any thread."""
+        try:
+            self._loop.call_soon_threadsafe(self._offer, message)
+        except RuntimeError:  # the subscriber's event loop has closed
+            self.close()
+
+    async def get(self, timeout=None):
+        """Wait up to ``timeout`` seconds and return every queued message ([] on timeout)."""
+        try:
+            messages = [await asyncio.wait_for(self._queue.get(), timeout)]
+        except asyncio.TimeoutError:
+            return []
+        while not self._queue.empty():
+            messages.append(self._queue.get_nowait())
+        return messages
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Fan messages out to the subscriptions of this process."""
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        self.deliver(channel, message)
+
+    def deliver(self, channel, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.deliver(message)
+
+    def subscribe(self, channel):
+        """Subscribe to ``channel``; call from the event loop that will read the messages."""
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.channel]
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Publish through Redis (MEDICATION_EVENTS_REDIS_URL). Each event loop keeps
+    one pattern subscription and hands messages to its local subscriptions,
+    so open streams do not each hold a Redis connection.
+    """
+
+    def __init__(self):
+        if redis is None:
+            raise ImportError('RedisBroker requires the redis package')
+        super().__init__()
+        self.url = settings.MEDICATION_EVENTS_REDIS_URL
+        self._client = redis.Redis.from_url(self.url)
+        self._readers = {}
+
+    def publish(self, channel, message):
+        self._client.publish(channel, message)
+
+    def subscribe(self, channel):
+        subscription = super().subscribe(channel)
+        loop = asyncio.get_running_loop()
+        reader = self._readers.get(loop)
+        if reader is None or reader.done():
+            self._readers[loop] = loop.create_task(self._read())
+        return subscription
+
+    async def _read(self):
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.psubscribe(f'{CHANNEL_PREFIX}*')
+            async for item in pubsub.listen():
+                if item['type'] == 'pmessage':
+                    self.deliver(item['channel'].decode(), item['data'].decode())
+        except Exception as e:
+            # The next subscribe() on this loop starts a new reader
+            logger.error(f"Event reader lost its Redis subscription: {str(e)}")
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.MEDICATION_EVENTS_BACKEND)()
+    return _broker
+
+
+def publish_event(user_id, event, data=None):
+    """
+    Publish ``event`` to the user's channel once the current transaction
+    commits. Delivery is best effort: failures are logged, never raised.
+    """
+    message = json.dumps({'event': event, 'data': data or {}})
+
+    def send():
+        try:
+            get_broker().publish(user_channel(user_id), message)
+        except Exception as e:
+            logger.error(f"Failed to publish {event} event for user {user_id}: {str(e)}")
+
+    transaction.on_commit(send)
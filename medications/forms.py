@@ -1,6 +1,7 @@
 from django import forms
-from .models import Medication
+from .models import Medication, MedicationSchedule
 from django.utils import timezone
+from datetime import time
 
 class MedicationForm(forms.ModelForm):
     scheduled_datetime = forms.DateTimeField(
@@ -33,3 +34,67 @@ class MedicationForm(forms.ModelForm):
             raise forms.ValidationError("Scheduled time must be in the future.")
         
         return scheduled_datetime
+
+
+class MedicationScheduleForm(forms.ModelForm):
+    WEEKDAY_CHOICES = [
+        ('0', 'Mon'), ('1', 'Tue'), ('2', 'Wed'), ('3', 'Thu'),
+        ('4', 'Fri'), ('5', 'Sat'), ('6', 'Sun'),
+    ]
+    
+    weekdays = forms.MultipleChoiceField(
+        choices=WEEKDAY_CHOICES,
+        required=False,
+        widget=forms.CheckboxSelectMultiple,
+        help_text='Leave empty to repeat on every day'
+    )
+    
+    class Meta:
+        model = MedicationSchedule
+        fields = ['name', 'dosage', 'start_date', 'end_date', 'interval_days', 'weekdays', 'times_of_day']
+        widgets = {
+            'name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter medication name'}),
+            'dosage': forms.Textarea(attrs={'class': 'form-control', 'rows': 3, 'placeholder': 'Enter dosage information (e.g., 2 tablets, 500mg)'}),
+            'start_date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+            'end_date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+            'interval_days': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
+            'times_of_day': forms.TextInput(attrs={'class': 'form-control', 'placeholder': '08:00,20:00'}),
+        }
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.initial['weekdays'] = sorted(str(day) for day in self.instance.get_weekdays())
+    
+    def clean_weekdays(self):
+        return ','.join(sorted(self.cleaned_data['weekdays']))
+    
+    def clean_interval_days(self):
+        interval_days = self.cleaned_data['interval_days']
+        if interval_days < 1:
+            raise forms.ValidationError("Interval must be at least 1 day.")
+        return interval_days
+    
+    def clean_times_of_day(self):
+        times = []
+        for value in self.cleaned_data['times_of_day'].split(','):
+            value = value.strip()
+            if not value:
+                continue
+            try:
+                parsed = time.fromisoformat(value)
+            except ValueError:
+                raise forms.ValidationError(f'"{value}" is not a valid HH:MM time.')
+            times.append(parsed.strftime('%H:%M'))
+        
+        if not times:
+            raise forms.ValidationError("Enter at least one time of day.")
+        return ','.join(sorted(set(times)))
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        if start_date and end_date and end_date < start_date:
+            self.add_error('end_date', "End date cannot be before the start date.")
+        return cleaned_data
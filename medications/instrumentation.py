@@ -0,0 +1,216 @@
+"""
+Opt-in request instrumentation (REQUEST_METRICS_ENABLED).
+
+For every request InstrumentationMiddleware measures the total time, the
+number and duration of SQL queries, template render time and response
+size. It adds them to the response as a Server-Timing header and to
+per-URL-name histograms, which metrics_view serves in the Prometheus text
+format. Histograms are kept in process memory, so with several worker
+processes each one has to be scraped on its own.
+
+Queries are counted by an execute wrapper installed on every database
+connection, and template time by InstrumentedDjangoTemplates, the template
+backend settings.py switches to while instrumentation is enabled. Work
+done while a streaming response is consumed is not included.
+"""
+import threading
+import time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.template.backends.django import DjangoTemplates
+
+_current = ContextVar('medications_request_metrics', default=None)
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+BYTES_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+
+
+class Histogram:
+    """A Prometheus histogram with one series per URL name."""
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, view, value):
+        with self._lock:
+            series = self._series.get(view)
+            if series is None:
+                series = self._series[view] = {'buckets': [0] * len(self.buckets), 'sum': 0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {view: {**values, 'buckets': list(values['buckets'])} for view, values in self._series.items()}
+        for view, values in sorted(series.items()):
+            label = f'view="{_escape(view)}"'
+            for bound, count in zip(self.buckets, values['buckets']):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {values["count"]}')
+            lines.append(f'{self.name}_sum{{{label}}} {values["sum"]}')
+            lines.append(f'{self.name}_count{{{label}}} {values["count"]}')
+        return lines
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_SECONDS = Histogram(
+    'medication_reminder_request_duration_seconds', 'Time spent handling the request.', SECONDS_BUCKETS
+)
+SQL_QUERIES = Histogram(
+    'medication_reminder_request_sql_queries', 'SQL queries run per request.', QUERY_BUCKETS
+)
+SQL_SECONDS = Histogram(
+    'medication_reminder_request_sql_duration_seconds', 'Time spent in SQL queries per request.', SECONDS_BUCKETS
+)
+TEMPLATE_SECONDS = Histogram(
+    'medication_reminder_request_template_duration_seconds', 'Time spent rendering templates per request.',
+    SECONDS_BUCKETS,
+)
+RESPONSE_BYTES = Histogram(
+    'medication_reminder_response_size_bytes', 'Response body size (streamed responses excluded).', BYTES_BUCKETS
+)
+HISTOGRAMS = (REQUEST_SECONDS, SQL_QUERIES, SQL_SECONDS, TEMPLATE_SECONDS, RESPONSE_BYTES)
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.sql_seconds += time.perf_counter() - start
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    if settings.REQUEST_METRICS_ENABLED and _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class _TimedTemplate:
+    """Wraps a backend template and adds its render time to the current request's metrics."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics = _current.get()
+            if metrics is not None:
+                metrics.template_seconds += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The Django template backend with render timing (top-level templates; includes count towards them)."""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+class InstrumentationMiddleware:
+    """Measure each request; keep it first in MIDDLEWARE so the total covers the others."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._record(request, response, metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._record(request, response, metrics, time.perf_counter() - start)
+
+    def _record(self, request, response, metrics, elapsed):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else 'unresolved'
+
+        REQUEST_SECONDS.observe(view, elapsed)
+        SQL_QUERIES.observe(view, metrics.queries)
+        SQL_SECONDS.observe(view, metrics.sql_seconds)
+        TEMPLATE_SECONDS.observe(view, metrics.template_seconds)
+        if not response.streaming:
+            RESPONSE_BYTES.observe(view, len(response.content))
+
+        response['Server-Timing'] = ', '.join([
+            f'sql;dur={metrics.sql_seconds * 1000:.2f};desc="{metrics.queries} queries"',
+            f'tpl;dur={metrics.template_seconds * 1000:.2f}',
+            f'total;dur={elapsed * 1000:.2f}',
+        ])
+        return response
+
+
+def render_metrics():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint for this process's request histograms
+    Usage: GET /metrics/  (as a staff user, or from REQUEST_METRICS_ALLOWED_IPS)
+    """
+    if not settings.REQUEST_METRICS_ENABLED:
+        raise Http404
+    if request.META.get('REMOTE_ADDR') not in settings.REQUEST_METRICS_ALLOWED_IPS and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
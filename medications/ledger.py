@@ -0,0 +1,74 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Medication, MedicationSchedule, ReminderDelivery
+
+
+def _pending_dose(medication_id, scheduled_datetime, schedule_id):
+    """
+    Return the ledger lookup ({medication_id|schedule_id, scheduled_datetime})
+    for a still-pending dose, or None if the dose is gone, taken or superseded.
+    """
+    if schedule_id is not None:
+        schedule = MedicationSchedule.objects.filter(pk=schedule_id, is_active=True).first()
+        if schedule is None:
+            return None
+        when = timezone.make_aware(
+            timezone.datetime.strptime(scheduled_datetime, '%Y-%m-%d %H:%M'),
+            timezone.get_current_timezone(),
+        )
+        # The schedule may have been edited since the reminder was queued
+        if not schedule.is_occurrence(when):
+            return None
+        if Medication.objects.filter(schedule_id=schedule_id, scheduled_datetime=when).exists():
+            return None
+        return {'schedule_id': schedule_id, 'scheduled_datetime': when}
+
+    medication = Medication.objects.filter(pk=medication_id, status='pending').only('scheduled_datetime').first()
+    if medication is None:
+        return None
+    if timezone.localtime(medication.scheduled_datetime).strftime('%Y-%m-%d %H:%M') != scheduled_datetime:
+        # Superseded by an edit; the new time gets its own reminder
+        return None
+    return {'medication_id': medication_id, 'scheduled_datetime': medication.scheduled_datetime}
+
+
+def claim_reminder(medication_id, scheduled_datetime, schedule_id=None):
+    """
+    Atomically claim the right to send a dose's reminder.
+
+    ``scheduled_datetime`` is the local '%Y-%m-%d %H:%M' string the reminder was
+    queued with; schedule occurrences pass ``schedule_id`` instead of a
+    medication id. Returns the claimed ReminderDelivery, or None when the
+    reminder must not be sent: the dose was deleted, taken or rescheduled since
+    it was queued, or another task has already sent (or is sending) it.
+    """
+    dose = _pending_dose(medication_id, scheduled_datetime, schedule_id)
+    if dose is None:
+        return None
+
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            return ReminderDelivery.objects.create(claimed_at=now, **dose)
+    except IntegrityError:
+        pass
+
+    # Already in the ledger: only failed sends and claims whose worker died may be taken over
+    stale = now - timedelta(seconds=settings.REMINDER_CLAIM_TIMEOUT)
+    deliveries = ReminderDelivery.objects.filter(**dose)
+    claimed = deliveries.filter(
+        Q(status='failed') | Q(status='claimed', claimed_at__lt=stale)
+    ).update(status='claimed', claimed_at=now)
+    return deliveries.first() if claimed else None
+
+
+def mark_reminder_sent(delivery):
+    ReminderDelivery.objects.filter(pk=delivery.pk).update(status='sent', sent_at=timezone.now())
+
+
+def release_reminder(delivery):
+    """Give up a claim after a failed send so a retry can claim it again."""
+    ReminderDelivery.objects.filter(pk=delivery.pk, status='claimed').update(status='failed')
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from medications.adherence import (
+    adherence_report, daily_counts, rebuild_user_adherence, refresh_adherence_for, compute_streaks, ROLLUP_FIELDS
+)
+from medications.benchmarks import create_bench_users, seed_medications, timed
+from medications.models import Medication
+from datetime import timedelta
+
+
+def _scan_report(user, days, now):
+    """The same report computed by scanning the user's full Medication history."""
+    first = Medication.objects.filter(user=user).order_by('scheduled_datetime').first()
+    today = timezone.localdate(now)
+    counts = daily_counts(user.id, timezone.localdate(first.scheduled_datetime), today, now)
+    rows = [(day, *(counts[day][field] for field in ROLLUP_FIELDS)) for day in sorted(counts)]
+    first_day = today - timedelta(days=days - 1)
+    return compute_streaks(rows), [row for row in rows if row[0] >= first_day]
+
+
+class Command(BaseCommand):
+    help = 'Compare adherence reports read from the daily rollups with a full history scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--years',
+            type=int,
+            default=3,
+            help='Years of synthetic history to seed (default: 3)',
+        )
+        parser.add_argument(
+            '--doses-per-day',
+            type=int,
+            default=4,
+            help='Average doses per day for the measured user (default: 4)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=90,
+            help='Report range in days (default: 90)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Timed runs per measurement (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        if options['years'] < 1 or options['doses_per_day'] < 1:
+            raise CommandError('--years and --doses-per-day must be at least 1')
+
+        # Everything runs in one transaction that is rolled back at the end
+        with transaction.atomic():
+            now = timezone.now()
+            user = create_bench_users(1)[0]
+            span_days = options['years'] * 365
+            seeded = seed_medications(
+                [user], span_days * options['doses_per_day'], now=now, span_days=span_days
+            )
+            self.stdout.write(self.style.SUCCESS(f'=== {seeded} medications over {options["years"]} years ==='))
+
+            measurements = {
+                'rebuild all rollups': lambda: rebuild_user_adherence(user.id, now=now),
+                'report from full scan': lambda: _scan_report(user, options['days'], now),
+                'report from rollups': lambda: adherence_report(user, days=options['days'], now=now),
+                'refresh one day (mark taken)': lambda: refresh_adherence_for(user.id, [now], now=now),
+            }
+            for name, func in measurements.items():
+                timing = timed(func, repeat=options['repeat'])
+                self.stdout.write(
+                    f'  {name:<30} median {timing["median"]:9.2f} ms  '
+                    f'(min {timing["min"]:.2f}, max {timing["max"]:.2f})'
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,167 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.utils import timezone
+from medications.benchmarks import create_bench_users, percentile, seed_medications
+from medications.models import Medication
+from medications.serialization import medication_values
+
+
+def _run(operation, deadline, results):
+    """Call ``operation`` until ``deadline`` on this thread's own connection, recording latencies/errors."""
+    try:
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                operation()
+            except OperationalError as e:
+                results['errors'][str(e)] = results['errors'].get(str(e), 0) + 1
+                continue
+            results['latencies'].append((time.perf_counter() - start) * 1000)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Run concurrent mark-taken writes and medication list reads against the configured '
+        'database and report throughput, p50/p99 latency and lock errors'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--writers',
+            type=int,
+            default=4,
+            help='Threads marking doses taken (default: 4)',
+        )
+        parser.add_argument(
+            '--readers',
+            type=int,
+            default=8,
+            help='Threads reading the first page of a medication list (default: 8)',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=10,
+            help='Seconds to run (default: 10)',
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=20,
+            help='Synthetic users to seed (default: 20)',
+        )
+        parser.add_argument(
+            '--per-user',
+            type=int,
+            default=500,
+            help='Medications to seed per user (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        if options['writers'] < 0 or options['readers'] < 0 or options['writers'] + options['readers'] == 0:
+            raise CommandError('--writers and --readers must not be negative, and not both zero')
+        if options['duration'] <= 0 or options['users'] < 1 or options['per_user'] < 1:
+            raise CommandError('--duration, --users and --per-user must be positive')
+
+        self._describe_database()
+
+        # The threads use their own connections and cannot see an uncommitted transaction,
+        # so the data is committed and deleted again at the end
+        users = create_bench_users(options['users'])
+        try:
+            seed_medications(users, options['per_user'], now=timezone.now())
+            ids = list(Medication.objects.filter(user__in=users).values_list('id', 'user_id'))
+            self._measure(users, ids, options)
+        finally:
+            Medication.objects.filter(user__in=users).delete()
+            for user in users:
+                user.delete()
+
+    def _describe_database(self):
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                journal_mode = cursor.fetchone()[0]
+                cursor.execute('PRAGMA synchronous')
+                synchronous = cursor.fetchone()[0]
+            timeout = settings.DATABASES['default'].get('OPTIONS', {}).get('timeout', 5)
+            self.stdout.write(f'SQLite journal_mode={journal_mode} synchronous={synchronous} busy timeout={timeout}s')
+        else:
+            self.stdout.write(f'{connection.vendor} (CONN_MAX_AGE={connection.settings_dict["CONN_MAX_AGE"]})')
+
+    def _measure(self, users, ids, options):
+        deadline = time.monotonic() + options['duration']
+        threads = []
+        roles = {'mark taken': [], 'list read': []}
+
+        for i in range(options['writers']):
+            results = {'latencies': [], 'errors': {}}
+            roles['mark taken'].append(results)
+            threads.append(threading.Thread(
+                target=_run, args=(self._writer(ids[i::options['writers']]), deadline, results)
+            ))
+        for i in range(options['readers']):
+            results = {'latencies': [], 'errors': {}}
+            roles['list read'].append(results)
+            threads.append(threading.Thread(
+                target=_run, args=(self._reader(users, seed=i), deadline, results)
+            ))
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n=== {options["writers"]} writers, {options["readers"]} readers, {options["duration"]:g}s ==='
+        ))
+        for role, results in roles.items():
+            if not results:
+                continue
+            latencies = sorted(ms for result in results for ms in result['latencies'])
+            errors = {}
+            for result in results:
+                for message, count in result['errors'].items():
+                    errors[message] = errors.get(message, 0) + count
+            self.stdout.write(
+                f'  {role:<12} {len(latencies) / options["duration"]:9.1f} ops/s  '
+                f'p50 {percentile(latencies, 50):8.2f} ms  p99 {percentile(latencies, 99):8.2f} ms  '
+                f'errors {sum(errors.values())}'
+            )
+            for message, count in errors.items():
+                self.stdout.write(self.style.WARNING(f'    {count} x {message}'))
+
+    def _writer(self, own_ids):
+        """Single-row mark-taken UPDATEs over this writer's doses, resetting them on alternate passes."""
+        position = 0
+        taking = True
+
+        def operation():
+            nonlocal position, taking
+            medication_id, user_id = own_ids[position]
+            doses = Medication.objects.filter(pk=medication_id, user_id=user_id)
+            if taking:
+                doses.mark_taken()
+            else:
+                doses.update(status='pending', taken_at=None)
+            position += 1
+            if position == len(own_ids):
+                position = 0
+                taking = not taking
+        return operation
+
+    def _reader(self, users, seed):
+        """First page of a random user's medication list, as api_medications_list reads it."""
+        rng = random.Random(seed)
+
+        def operation():
+            user = rng.choice(users)
+            list(medication_values(Medication.objects.filter(user=user)).order_by('-scheduled_datetime', '-id')[:50])
+        return operation
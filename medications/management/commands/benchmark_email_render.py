@@ -0,0 +1,46 @@
+import time
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+from medications.emails import render_reminder
+
+
+def _render_legacy(context):
+    # Previous pipeline: full template render + regex tag stripping for the text part
+    html_message = render_to_string('emails/medication_reminder.html', context)
+    return html_message, strip_tags(html_message)
+
+
+class Command(BaseCommand):
+    help = 'Measure per-message render cost of the reminder email (legacy vs cached pipeline)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--messages',
+            type=int,
+            default=2000,
+            help='Number of messages to render per pipeline (default: 2000)',
+        )
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        contexts = [
+            {
+                'medication_name': f'Medication {i}',
+                'dosage': '2 tablets, 500mg each',
+                'scheduled_datetime': 'October 18, 2026 at 08:00 AM',
+                'current_time': 'October 18, 2026 at 08:01 AM',
+                'is_overdue': i % 2 == 0,
+            }
+            for i in range(count)
+        ]
+
+        for label, render in (('legacy', _render_legacy), ('cached', render_reminder)):
+            render(contexts[0])  # warm up template loading and the shell cache
+            start = time.perf_counter()
+            for context in contexts:
+                render(context)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'{label:<7} {elapsed / count * 1e6:9.1f} us/message  {count / elapsed:10.0f} messages/sec'
+            )
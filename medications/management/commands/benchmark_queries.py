@@ -0,0 +1,121 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from medications.benchmarks import create_bench_users, seed_medications, timed, explain
+from medications.models import Medication
+from medications.statistics import get_medication_statistics
+from datetime import timedelta
+
+
+def _hot_queries(user, now):
+    """The queries issued by the list view, the JSON API and cleanup_medications."""
+    medications = Medication.objects.filter(user=user)
+    cutoff = now - timedelta(days=30)
+    return {
+        'list_pending_page': lambda: list(medications.filter(status='pending')[:5]),
+        'list_taken_page': lambda: list(medications.filter(status='taken')[:5]),
+        'api_list': lambda: list(medications.order_by('-scheduled_datetime')),
+        # is_overdue evaluated per row in Python vs annotated in SQL
+        'api_list_overdue_python': lambda: [
+            medication.is_overdue for medication in medications.order_by('-scheduled_datetime')
+        ],
+        'api_list_overdue_sql': lambda: [
+            medication.is_overdue for medication in medications.with_overdue(now).order_by('-scheduled_datetime')
+        ],
+        'statistics': lambda: get_medication_statistics(user, now=now),
+        'cleanup_count': lambda: Medication.objects.filter(status='taken', taken_at__lt=cutoff).count(),
+        'cleanup_batch': lambda: list(
+            Medication.objects.filter(status='taken', taken_at__lt=cutoff)
+            .order_by().values_list('pk', flat=True)[:1000]
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Seed synthetic medications and report query plans and latencies for the hot queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='10000,100000',
+            help='Comma-separated total table sizes to grow through (default: 10000,100000)',
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=100,
+            help='Number of synthetic users the background rows are spread across (default: 100)',
+        )
+        parser.add_argument(
+            '--target-rows',
+            type=int,
+            default=2000,
+            help='Medications owned by the user the per-user queries run for (default: 2000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Timed runs per query (default: 5)',
+        )
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Also measure each query with the Medication indexes dropped',
+        )
+        parser.add_argument(
+            '--explain',
+            action='store_true',
+            help='Print the query plan of each query',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(size) for size in options['sizes'].split(','))
+        except ValueError:
+            raise CommandError('--sizes must be a comma-separated list of integers')
+        if options['users'] < 1:
+            raise CommandError('--users must be at least 1')
+
+        self.stdout.write(f'Database vendor: {connection.vendor}')
+
+        # Everything runs in one transaction that is rolled back at the end
+        with transaction.atomic():
+            now = timezone.now()
+            target = create_bench_users(1)[0]
+            others = create_bench_users(options['users'], start=1)
+            seeded = seed_medications([target], options['target_rows'], now=now)
+
+            for size in sizes:
+                remaining = size - seeded
+                if remaining > 0:
+                    per_user = max(1, remaining // len(others))
+                    seeded += seed_medications(others, per_user, now=now, seed=size)
+                self.stdout.write(self.style.SUCCESS(
+                    f'\n=== {seeded} medications ({options["target_rows"]} for the measured user) ==='
+                ))
+                self._report(target, now, options, label='indexed')
+
+                if options['compare']:
+                    with transaction.atomic():
+                        self._drop_indexes()
+                        self._report(target, now, options, label='no indexes')
+                        transaction.set_rollback(True)
+
+            transaction.set_rollback(True)
+
+    def _drop_indexes(self):
+        with connection.cursor() as cursor:
+            for index in Medication._meta.indexes:
+                cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+
+    def _report(self, user, now, options, label):
+        for name, query in _hot_queries(user, now).items():
+            timing = timed(query, repeat=options['repeat'])
+            self.stdout.write(
+                f'  [{label}] {name:<24} median {timing["median"]:8.2f} ms  '
+                f'(min {timing["min"]:.2f}, max {timing["max"]:.2f})'
+            )
+            if options['explain']:
+                for line in explain(query, label=label):
+                    self.stdout.write(f'      {line}')
@@ -0,0 +1,91 @@
+import json
+import time
+import tracemalloc
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from medications.benchmarks import create_bench_users
+from medications.models import Medication
+from medications.tasks import dispatch_due_reminders, reminder_kwargs, send_email_reminders_batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare broker load of one ETA task per medication with the periodic '
+        'dispatch_due_reminders scheduler as the number of future reminders grows'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='1000,10000,100000',
+            help='Comma-separated numbers of future reminders to schedule (default: 1000,10000,100000)',
+        )
+        parser.add_argument(
+            '--due',
+            type=int,
+            default=200,
+            help='Reminders that are due during the measured dispatch run (default: 200)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(size) for size in options['sizes'].split(','))
+        except ValueError:
+            raise CommandError('--sizes must be a comma-separated list of integers')
+
+        self.stdout.write(
+            f'{"future":>10} | {"ETA msgs":>9} {"ETA bytes":>12} | '
+            f'{"dispatch msgs":>13} {"dispatch ms":>11} {"peak KiB":>9}'
+        )
+
+        with transaction.atomic():
+            now = timezone.now()
+            user = create_bench_users(1)[0]
+            scheduled = 0
+
+            for size in sizes:
+                self._add_reminders(user, now, size - scheduled, future=True)
+                scheduled = size
+                self._add_reminders(user, now, options['due'], future=False)
+
+                # Old scheme: every scheduled reminder is an ETA message held by the broker/worker
+                eta_messages = 0
+                eta_bytes = 0
+                pending = Medication.objects.filter(user=user, status='pending').select_related('user')
+                for med in pending.iterator():
+                    message = {'kwargs': reminder_kwargs(med), 'eta': med.scheduled_datetime.isoformat()}
+                    eta_messages += 1
+                    eta_bytes += len(json.dumps(message))
+
+                # New scheme: only due reminders are published, once per minute
+                with mock.patch.object(send_email_reminders_batch, 'apply_async') as publish:
+                    tracemalloc.start()
+                    start = time.perf_counter()
+                    dispatch_due_reminders()
+                    elapsed = (time.perf_counter() - start) * 1000
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+
+                self.stdout.write(
+                    f'{size:>10} | {eta_messages:>9} {eta_bytes:>12} | '
+                    f'{publish.call_count:>13} {elapsed:>11.1f} {peak / 1024:>9.1f}'
+                )
+
+            transaction.set_rollback(True)
+
+    def _add_reminders(self, user, now, count, future):
+        if future:
+            times = (now + timedelta(days=1, seconds=i % 86400) for i in range(count))
+        else:
+            times = (now - timedelta(seconds=30 + i % 1800) for i in range(count))
+        Medication.objects.bulk_create(
+            [
+                Medication(user=user, name='Bench reminder', dosage='1 tablet', scheduled_datetime=when)
+                for when in times
+            ],
+            batch_size=5000,
+        )
@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.http import JsonResponse
+from django.utils import timezone
+from medications.benchmarks import create_bench_users, seed_medications, timed
+from medications.models import Medication
+from medications.serialization import medication_values, orjson, stdlib_dumps
+
+
+def _legacy_list(queryset):
+    """The previous api_medications_list body: model instances, a dict per row, JsonResponse."""
+    data = []
+    for med in queryset.order_by('-scheduled_datetime'):
+        data.append({
+            'id': med.id,
+            'name': med.name,
+            'dosage': med.dosage,
+            'scheduled_datetime': med.scheduled_datetime.isoformat(),
+            'status': med.status,
+            'is_overdue': med.is_overdue,
+            'created_at': med.created_at.isoformat(),
+        })
+    return JsonResponse({'success': True, 'medications': data, 'count': len(data)}).content
+
+
+def _fast_list(queryset, dumps):
+    data = list(medication_values(queryset).order_by('-scheduled_datetime'))
+    return dumps({'success': True, 'medications': data, 'count': len(data)})
+
+
+class Command(BaseCommand):
+    help = 'Compare rows/sec of the legacy and values()-based medication API serialisation'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            default='1000,10000,50000',
+            help='Comma-separated numbers of medications to serialise (default: 1000,10000,50000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Timed runs per implementation (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(size) for size in options['rows'].split(','))
+        except ValueError:
+            raise CommandError('--rows must be a comma-separated list of integers')
+
+        implementations = {
+            'legacy (instances + JsonResponse)': _legacy_list,
+            'values() + json': lambda queryset: _fast_list(queryset, stdlib_dumps),
+        }
+        if orjson is not None:
+            implementations['values() + orjson'] = lambda queryset: _fast_list(queryset, orjson.dumps)
+        else:
+            self.stdout.write(self.style.WARNING('orjson is not installed; only the stdlib encoder is measured'))
+
+        # Everything runs in one transaction that is rolled back at the end
+        with transaction.atomic():
+            now = timezone.now()
+            user = create_bench_users(1)[0]
+            seeded = 0
+            for size in sizes:
+                seeded += seed_medications([user], size - seeded, now=now, seed=size)
+                queryset = Medication.objects.filter(user=user)
+                self.stdout.write(self.style.SUCCESS(f'\n=== {seeded} medications ==='))
+
+                for name, implementation in implementations.items():
+                    timing = timed(lambda: implementation(queryset), repeat=options['repeat'])
+                    size_kb = len(implementation(queryset)) / 1024
+                    rows_per_sec = seeded / (timing['median'] / 1000) if timing['median'] else 0
+                    self.stdout.write(
+                        f'  {name:<34} median {timing["median"]:9.2f} ms  '
+                        f'{rows_per_sec:12,.0f} rows/s  ({size_kb:,.0f} KiB)'
+                    )
+
+            transaction.set_rollback(True)
@@ -1,7 +1,13 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.signals import post_delete
 from django.utils import timezone
-from medications.models import Medication
-from datetime import timedelta
+from medications.api_cache import bump_user_cache_version
+from medications.events import publish_event, STATS_CHANGED
+from medications.models import Medication, invalidate_medication_api_cache
+from datetime import datetime, timedelta
+import json
+import os
+import time
 
 class Command(BaseCommand):
     help = 'Clean up old taken medications (older than specified days)'
@@ -10,48 +16,145 @@ class Command(BaseCommand):
         parser.add_argument(
             '--days',
             type=int,
-            default=30,
-            help='Delete taken medications older than this many days (default: 30)',
+            help='Delete taken medications older than this many days (default: 30; '
+                 'a resumed run keeps the value it was started with)',
         )
         parser.add_argument(
             '--dry-run',
             action='store_true',
             help='Show what would be deleted without actually deleting',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Delete this many medications per transaction (default: 1000)',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help='Seconds to pause between batches to let the web app write (default: 0)',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='File recording progress; an interrupted run with the same file resumes where it stopped',
+        )
 
     def handle(self, *args, **options):
-        days = options['days']
+        days = options['days'] if options['days'] is not None else 30
         dry_run = options['dry_run']
+        batch_size = options['batch_size']
+        checkpoint = options['checkpoint']
+
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
         cutoff_date = timezone.now() - timedelta(days=days)
-        
+        last_pk = 0
+
+        state = self.load_checkpoint(checkpoint)
+        if state:
+            if options['days'] is not None and options['days'] != state['days']:
+                raise CommandError(
+                    f'Checkpoint {checkpoint} was started with --days {state["days"]}; '
+                    f'drop --days or delete the checkpoint to start over'
+                )
+            # Keep the original cutoff so a resumed run deletes the same set of rows
+            days = state['days']
+            cutoff_date = datetime.fromisoformat(state['cutoff'])
+            last_pk = state['last_pk']
+            self.stdout.write(f'Resuming from checkpoint: id > {last_pk}, cutoff {cutoff_date:%Y-%m-%d %H:%M}')
+
         old_medications = Medication.objects.filter(
             status='taken',
-            updated_at__lt=cutoff_date
+            taken_at__lt=cutoff_date,
+            pk__gt=last_pk,
         )
-        
+
         count = old_medications.count()
-        
+
         if count == 0:
             self.stdout.write(
                 self.style.SUCCESS(f'No taken medications older than {days} days found.')
             )
+            if not dry_run:
+                self.clear_checkpoint(checkpoint)
             return
-        
+
         if dry_run:
             self.stdout.write(
                 self.style.WARNING(f'DRY RUN: Would delete {count} taken medications older than {days} days:')
             )
             for med in old_medications[:10]:  # Show first 10
-                self.stdout.write(f'  - {med.name} (taken: {med.updated_at.strftime("%Y-%m-%d")})')
-            
+                self.stdout.write(f'  - {med.name} (taken: {med.taken_at.strftime("%Y-%m-%d")})')
+
             if count > 10:
                 self.stdout.write(f'  ... and {count - 10} more')
-            
+
             self.stdout.write('Run without --dry-run to actually delete these medications.')
-        else:
-            deleted_count = old_medications.count()
-            old_medications.delete()
-            
-            self.stdout.write(
-                self.style.SUCCESS(f'✅ Deleted {deleted_count} taken medications older than {days} days.')
+            return
+
+        # Without a post_delete receiver Django deletes each batch with plain DELETE
+        # statements instead of loading every row to signal it; the cache bump and
+        # stats event are sent once per user and batch below instead
+        post_delete.disconnect(invalidate_medication_api_cache, sender=Medication)
+        try:
+            deleted_count = self.delete_batches(old_medications, count, last_pk, days, cutoff_date, options)
+        finally:
+            post_delete.connect(invalidate_medication_api_cache, sender=Medication)
+
+        self.clear_checkpoint(checkpoint)
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Deleted {deleted_count} taken medications older than {days} days.')
+        )
+
+    def delete_batches(self, old_medications, count, last_pk, days, cutoff_date, options):
+        """Delete in primary-key order, one short transaction per batch, so the table is never locked for the whole purge."""
+        checkpoint = options['checkpoint']
+        batch_size = options['batch_size']
+        deleted_count = 0
+        while True:
+            batch = list(
+                old_medications.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', 'user_id')[:batch_size]
             )
+            if not batch:
+                break
+
+            # Re-apply the filters: a selected row may have been rescheduled or reset since
+            _, deleted = old_medications.filter(pk__in=[pk for pk, _ in batch]).delete()
+            deleted_count += deleted.get(Medication._meta.label, 0)
+            for user_id in {user_id for _, user_id in batch}:
+                bump_user_cache_version(user_id)
+                publish_event(user_id, STATS_CHANGED)
+            last_pk = batch[-1][0]
+            self.save_checkpoint(checkpoint, days, cutoff_date, last_pk)
+
+            self.stdout.write(f'  Deleted {deleted_count}/{count} (up to id {last_pk})')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        return deleted_count
+
+    def load_checkpoint(self, path):
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                state = json.load(f)
+            return {'days': int(state['days']), 'cutoff': state['cutoff'], 'last_pk': int(state['last_pk'])}
+        except (ValueError, KeyError, TypeError):
+            raise CommandError(f'Checkpoint file {path} is not valid; delete it to start over')
+
+    def save_checkpoint(self, path, days, cutoff_date, last_pk):
+        if not path:
+            return
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'days': days, 'cutoff': cutoff_date.isoformat(), 'last_pk': last_pk}, f)
+        os.replace(tmp_path, path)
+
+    def clear_checkpoint(self, path):
+        if path and os.path.exists(path):
+            os.remove(path)
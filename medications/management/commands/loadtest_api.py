@@ -0,0 +1,113 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from medications.benchmarks import percentile
+from medications.models import Medication
+
+
+def _poll(base_url, paths, cookie, deadline):
+    """Request ``paths`` round-robin until ``deadline``; return [(path, status, ms)]."""
+    samples = []
+    i = 0
+    while time.monotonic() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        request = Request(base_url + path, headers={'Cookie': cookie})
+        start = time.perf_counter()
+        try:
+            with urlopen(request, timeout=30) as response:
+                response.read()
+                status = response.status
+        except HTTPError as e:
+            status = e.code
+        except URLError:
+            status = 0
+        samples.append((path, status, (time.perf_counter() - start) * 1000))
+    return samples
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test the read API of a running server (e.g. gunicorn/WSGI vs uvicorn/ASGI with '
+        'MEDICATION_ASYNC_API_VIEWS=True) and report throughput and p50/p99 latency'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--base-url',
+            default='http://127.0.0.1:8000',
+            help='Server to load-test (default: http://127.0.0.1:8000)',
+        )
+        parser.add_argument(
+            '--username',
+            required=True,
+            help='Existing user whose medications are requested; a session is created for them',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=50,
+            help='Concurrent polling clients (default: 50)',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=30,
+            help='Seconds to run (default: 30)',
+        )
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['duration'] <= 0:
+            raise CommandError('--concurrency and --duration must be positive')
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["username"]}" does not exist')
+
+        # Log in the way django.contrib.auth.login() does, without a password
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        cookie = f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+        paths = [reverse('medications:api_medications_list'), reverse('medications:api_statistics')]
+        medication_id = Medication.objects.filter(user=user).values_list('id', flat=True).first()
+        if medication_id is not None:
+            paths.append(reverse('medications:api_medication_detail', args=[medication_id]))
+
+        base_url = options['base_url'].rstrip('/')
+        deadline = time.monotonic() + options['duration']
+        try:
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                futures = [
+                    executor.submit(_poll, base_url, paths, cookie, deadline)
+                    for _ in range(options['concurrency'])
+                ]
+                samples = [sample for future in futures for sample in future.result()]
+        finally:
+            session.delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n=== {base_url}: {options["concurrency"]} clients for {options["duration"]:g}s ==='
+        ))
+        for path in paths + ['total']:
+            rows = [s for s in samples if path in ('total', s[0])]
+            latencies = sorted(ms for _path, _status, ms in rows)
+            errors = sum(1 for _path, status, _ms in rows if status != 200)
+            self.stdout.write(
+                f'  {path:<32} {len(rows) / options["duration"]:9.1f} req/s  '
+                f'p50 {percentile(latencies, 50):8.2f} ms  p99 {percentile(latencies, 99):8.2f} ms  '
+                f'errors {errors}'
+            )
+        if not samples or all(status == 0 for _path, status, _ms in samples):
+            self.stdout.write(self.style.WARNING(f'No responses from {base_url}; is the server running?'))
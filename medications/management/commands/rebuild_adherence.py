@@ -0,0 +1,30 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from medications.adherence import rebuild_user_adherence
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily adherence rollups from the stored medication history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Only rebuild the rollups of this username',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(
+            Q(medications__isnull=False) | Q(medication_schedules__isnull=False)
+        ).distinct().order_by('id')
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f'No medications found for user "{options["user"]}"')
+
+        rebuilt = 0
+        for user_id in users.values_list('id', flat=True).iterator():
+            rebuild_user_adherence(user_id)
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt adherence rollups for {rebuilt} users'))
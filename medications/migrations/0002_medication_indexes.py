@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medication',
+            index=models.Index(fields=['user', 'status', 'scheduled_datetime'], name='med_user_status_sched_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medication',
+            index=models.Index(fields=['user', 'scheduled_datetime'], name='med_user_sched_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medication',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['user', 'scheduled_datetime'], name='med_pending_user_sched_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medication',
+            index=models.Index(fields=['status', 'updated_at'], name='med_status_updated_idx'),
+        ),
+    ]
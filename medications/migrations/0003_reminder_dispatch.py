@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:07
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_existing_reminders_dispatched(apps, schema_editor):
+    # Rows created before the scheduler already have an ETA task queued in the broker
+    Medication = apps.get_model('medications', 'Medication')
+    Medication.objects.filter(reminder_dispatched_at__isnull=True).update(reminder_dispatched_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0002_medication_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medication',
+            name='reminder_dispatched_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(mark_existing_reminders_dispatched, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='medication',
+            index=models.Index(condition=models.Q(('reminder_dispatched_at__isnull', True), ('status', 'pending')), fields=['scheduled_datetime'], name='med_due_reminder_idx'),
+        ),
+    ]
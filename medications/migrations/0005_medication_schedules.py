@@ -0,0 +1,76 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('medications', '0004_reminder_delivery_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicationSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('dosage', models.TextField()),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('interval_days', models.PositiveSmallIntegerField(default=1, help_text='Repeat every N days')),
+                ('weekdays', models.CharField(blank=True, help_text='Comma-separated weekdays (0=Monday); blank for every day', max_length=13)),
+                ('times_of_day', models.CharField(help_text='Comma-separated HH:MM times, e.g. 08:00,20:00', max_length=200)),
+                ('is_active', models.BooleanField(default=True)),
+                ('next_reminder_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name='reminderdelivery',
+            name='unique_reminder_per_dose',
+        ),
+        migrations.AlterField(
+            model_name='reminderdelivery',
+            name='medication',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reminder_deliveries', to='medications.medication'),
+        ),
+        migrations.AddField(
+            model_name='medicationschedule',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='medication_schedules', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='medication',
+            name='schedule',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='occurrences', to='medications.medicationschedule'),
+        ),
+        migrations.AddField(
+            model_name='reminderdelivery',
+            name='schedule',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reminder_deliveries', to='medications.medicationschedule'),
+        ),
+        migrations.AddConstraint(
+            model_name='medication',
+            constraint=models.UniqueConstraint(condition=models.Q(('schedule__isnull', False)), fields=('schedule', 'scheduled_datetime'), name='unique_schedule_occurrence'),
+        ),
+        migrations.AddConstraint(
+            model_name='reminderdelivery',
+            constraint=models.UniqueConstraint(condition=models.Q(('medication__isnull', False)), fields=('medication', 'scheduled_datetime'), name='unique_reminder_per_dose'),
+        ),
+        migrations.AddConstraint(
+            model_name='reminderdelivery',
+            constraint=models.UniqueConstraint(condition=models.Q(('schedule__isnull', False)), fields=('schedule', 'scheduled_datetime'), name='unique_reminder_per_occurrence'),
+        ),
+        migrations.AddIndex(
+            model_name='medicationschedule',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['next_reminder_at'], name='sched_next_reminder_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('medications', '0005_medication_schedules'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAdherence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('due', models.PositiveIntegerField(default=0)),
+                ('taken_on_time', models.PositiveIntegerField(default=0)),
+                ('taken_late', models.PositiveIntegerField(default=0)),
+                ('missed', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='medication',
+            index=models.Index(fields=['scheduled_datetime'], name='med_sched_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailyadherence',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_adherence', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyadherence',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='unique_daily_adherence'),
+        ),
+    ]
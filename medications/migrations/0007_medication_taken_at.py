@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:25
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_taken_at(apps, schema_editor):
+    # Until now the moment a dose was taken was only recorded implicitly in updated_at
+    Medication = apps.get_model('medications', 'Medication')
+    Medication.objects.filter(status='taken', taken_at__isnull=True).update(taken_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0006_daily_adherence'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='medication',
+            name='med_status_updated_idx',
+        ),
+        migrations.AddField(
+            model_name='medication',
+            name='taken_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_taken_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='medication',
+            index=models.Index(condition=models.Q(('status', 'taken')), fields=['taken_at'], name='med_taken_at_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:51
+
+import datetime
+import django.core.validators
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def repair_schedules(apps, schema_editor):
+    MedicationSchedule = apps.get_model('medications', 'MedicationSchedule')
+    # An interval of 0 made occurrence expansion divide by zero
+    MedicationSchedule.objects.filter(interval_days=0).update(interval_days=1)
+    # Schedules starting beyond the old search horizon were saved without a next reminder.
+    # The day before the start date is a safe lower bound in any time zone; the dispatcher
+    # moves it on to the first real occurrence.
+    schedules = MedicationSchedule.objects.filter(
+        is_active=True, next_reminder_at__isnull=True, start_date__gte=timezone.now().date()
+    )
+    for schedule in schedules:
+        schedule.next_reminder_at = datetime.datetime.combine(
+            schedule.start_date - datetime.timedelta(days=1), datetime.time.min, tzinfo=datetime.timezone.utc
+        )
+        schedule.save(update_fields=['next_reminder_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0007_medication_taken_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(repair_schedules, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='medicationschedule',
+            name='interval_days',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Repeat every N days', validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddConstraint(
+            model_name='medicationschedule',
+            constraint=models.CheckConstraint(check=models.Q(('interval_days__gte', 1)), name='sched_interval_days_positive'),
+        ),
+    ]
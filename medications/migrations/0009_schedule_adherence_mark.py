@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:52
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def start_marks(apps, schema_editor):
+    # Until now every active schedule was expanded on each refresh; start counting from here
+    # (occurrences before this were covered by those refreshes)
+    MedicationSchedule = apps.get_model('medications', 'MedicationSchedule')
+    MedicationSchedule.objects.filter(is_active=True).update(next_adherence_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0008_schedule_interval_check'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicationschedule',
+            name='next_adherence_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(start_marks, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='medicationschedule',
+            index=models.Index(condition=models.Q(('next_adherence_at__isnull', False)), fields=['next_adherence_at'], name='sched_next_adherence_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0009_schedule_adherence_mark'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medication',
+            index=models.Index(condition=models.Q(('reminder_dispatched_at__isnull', True), ('status', 'pending')), fields=['updated_at'], name='med_late_reminder_idx'),
+        ),
+    ]
@@ -1,6 +1,38 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator
 from django.utils import timezone
+from datetime import datetime, time, timedelta
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .api_cache import bump_user_cache_version
+from .events import publish_event, STATS_CHANGED
+
+
+class MedicationQuerySet(models.QuerySet):
+    
+    def with_overdue(self, now=None):
+        """
+        Annotate ``is_overdue`` in SQL against a single ``now``, so a whole
+        response agrees on which doses are overdue.
+        """
+        if now is None:
+            now = timezone.now()
+        return self.annotate(is_overdue=models.ExpressionWrapper(
+            models.Q(status='pending', scheduled_datetime__lt=now),
+            output_field=models.BooleanField(),
+        ))
+    
+    def mark_taken(self, now=None):
+        """
+        Mark the pending medications in this queryset as taken with a single
+        conditional UPDATE. Returns the number of rows that changed.
+        """
+        if now is None:
+            now = timezone.now()
+        return self.filter(status='pending').update(status='taken', taken_at=now, updated_at=now)
+
 
 class Medication(models.Model):
     STATUS_CHOICES = [
@@ -13,15 +45,280 @@ class Medication(models.Model):
     dosage = models.TextField()
     scheduled_datetime = models.DateTimeField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    reminder_dispatched_at = models.DateTimeField(null=True, blank=True, editable=False)
+    taken_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Set when the row is a taken occurrence of a recurring schedule
+    schedule = models.ForeignKey(
+        'MedicationSchedule', on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name='occurrences',
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = MedicationQuerySet.as_manager()
+    
     class Meta:
         ordering = ['scheduled_datetime']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['schedule', 'scheduled_datetime'],
+                condition=models.Q(schedule__isnull=False),
+                name='unique_schedule_occurrence',
+            ),
+        ]
+        indexes = [
+            # List view sections and statistics: filter by user + status, order by time
+            models.Index(fields=['user', 'status', 'scheduled_datetime'], name='med_user_status_sched_idx'),
+            # API list: all of a user's medications ordered by time
+            models.Index(fields=['user', 'scheduled_datetime'], name='med_user_sched_idx'),
+            # Pending doses are the hot subset (overdue/today counters)
+            models.Index(
+                fields=['user', 'scheduled_datetime'],
+                condition=models.Q(status='pending'),
+                name='med_pending_user_sched_idx',
+            ),
+            # dispatch_due_reminders: pending doses whose reminder has not gone out yet
+            models.Index(
+                fields=['scheduled_datetime'],
+                condition=models.Q(status='pending', reminder_dispatched_at__isnull=True),
+                name='med_due_reminder_idx',
+            ),
+            # dispatch_due_reminders: doses created or rescheduled after their time had passed
+            models.Index(
+                fields=['updated_at'],
+                condition=models.Q(status='pending', reminder_dispatched_at__isnull=True),
+                name='med_late_reminder_idx',
+            ),
+            # cleanup_medications and refresh_adherence_rollups: doses by the time they were taken
+            models.Index(
+                fields=['taken_at'],
+                condition=models.Q(status='taken'),
+                name='med_taken_at_idx',
+            ),
+            # refresh_adherence_rollups: doses of any user that just passed their time
+            models.Index(fields=['scheduled_datetime'], name='med_sched_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.scheduled_datetime.strftime('%Y-%m-%d %H:%M')}"
     
+    def save(self, *args, **kwargs):
+        # Keep taken_at in step with status changes made through save() (e.g. the admin)
+        if self.status == 'taken' and self.taken_at is None:
+            self.taken_at = timezone.now()
+        elif self.status == 'pending':
+            self.taken_at = None
+        super().save(*args, **kwargs)
+    
     @property
     def is_overdue(self):
+        # Rows loaded through MedicationQuerySet.with_overdue() carry the SQL value
+        if '_is_overdue' in self.__dict__:
+            return self._is_overdue
         return self.scheduled_datetime < timezone.now() and self.status == 'pending'
+    
+    @is_overdue.setter
+    def is_overdue(self, value):
+        self._is_overdue = value
+
+
+class MedicationSchedule(models.Model):
+    """
+    A recurring dose schedule. Occurrences are generated on the fly (see
+    medications.recurrence) and only stored as Medication rows once taken.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='medication_schedules')
+    name = models.CharField(max_length=100)
+    dosage = models.TextField()
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    interval_days = models.PositiveSmallIntegerField(
+        default=1, validators=[MinValueValidator(1)], help_text='Repeat every N days'
+    )
+    weekdays = models.CharField(
+        max_length=13, blank=True,
+        help_text='Comma-separated weekdays (0=Monday); blank for every day',
+    )
+    times_of_day = models.CharField(max_length=200, help_text='Comma-separated HH:MM times, e.g. 08:00,20:00')
+    is_active = models.BooleanField(default=True)
+    # First occurrence the reminder scheduler has not handled yet
+    next_reminder_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # First occurrence not yet counted in the adherence rollups (see medications.adherence)
+    next_adherence_at = models.DateTimeField(null=True, blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['name']
+        indexes = [
+            models.Index(
+                fields=['next_reminder_at'],
+                condition=models.Q(is_active=True),
+                name='sched_next_reminder_idx',
+            ),
+            models.Index(
+                fields=['next_adherence_at'],
+                condition=models.Q(next_adherence_at__isnull=False),
+                name='sched_next_adherence_idx',
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(check=models.Q(interval_days__gte=1), name='sched_interval_days_positive'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} ({self.times_of_day})"
+    
+    def save(self, *args, **kwargs):
+        now = timezone.now()
+        self.next_reminder_at = self.next_occurrence(now) if self.is_active else None
+        if self.is_active:
+            # Keep occurrences that passed since the last rollup refresh in line to be counted
+            after = min(self.next_adherence_at, now) if self.next_adherence_at else now
+            self.next_adherence_at = self.next_occurrence(after)
+        # A stopped schedule keeps its mark until the refresh has counted it up to the stop
+        super().save(*args, **kwargs)
+    
+    def clean(self):
+        try:
+            weekdays = self.get_weekdays()
+        except ValueError:
+            raise ValidationError({'weekdays': 'Enter comma-separated weekday numbers (0=Monday).'})
+        if not weekdays <= set(range(7)):
+            raise ValidationError({'weekdays': 'Weekdays must be between 0 (Monday) and 6 (Sunday).'})
+        if not self.start_date or not self.interval_days or self.interval_days < 1:
+            return
+        if self.end_date and self.end_date < self.start_date:
+            raise ValidationError({'end_date': 'End date cannot be before the start date.'})
+        # The days of the interval grid cycle through their weekdays within 7 steps
+        for step in range(7):
+            day = self.start_date + timedelta(days=step * self.interval_days)
+            if self.end_date and day > self.end_date:
+                break
+            if not weekdays or day.weekday() in weekdays:
+                return
+        raise ValidationError(
+            'No day of this schedule falls on one of the selected weekdays; '
+            'change the weekdays, interval, start date or end date.'
+        )
+    
+    def get_weekdays(self):
+        return {int(day) for day in self.weekdays.split(',') if day.strip()}
+    
+    def get_times(self):
+        return sorted(time.fromisoformat(value.strip()) for value in self.times_of_day.split(',') if value.strip())
+    
+    def occurrence_times(self, start, end):
+        """Yield the aware datetimes of occurrences in [start, end), in order."""
+        tz = timezone.get_current_timezone()
+        weekdays = self.get_weekdays()
+        times = self.get_times()
+        
+        day = max(self.start_date, timezone.localtime(start, tz).date())
+        last_day = timezone.localtime(end, tz).date()
+        if self.end_date:
+            last_day = min(last_day, self.end_date)
+        
+        # Align to the interval grid that starts at start_date
+        offset = (day - self.start_date).days % self.interval_days
+        if offset:
+            day += timedelta(days=self.interval_days - offset)
+        
+        while day <= last_day:
+            if not weekdays or day.weekday() in weekdays:
+                for time_of_day in times:
+                    when = timezone.make_aware(datetime.combine(day, time_of_day), tz)
+                    if start <= when < end:
+                        yield when
+            day += timedelta(days=self.interval_days)
+    
+    def next_occurrence(self, after):
+        """First occurrence at or after ``after``, or None once the schedule has ended."""
+        # Search from the start date when it lies ahead; from there the weekday/interval
+        # pattern repeats within 7 * interval_days days
+        start_of_schedule = timezone.make_aware(datetime.combine(self.start_date, time.min))
+        start = max(after, start_of_schedule)
+        horizon = start + timedelta(days=7 * self.interval_days + 1)
+        return next(self.occurrence_times(start, horizon), None)
+    
+    def is_occurrence(self, when):
+        return self.next_occurrence(when) == when
+
+
+class ReminderDelivery(models.Model):
+    """Ledger of reminder emails, one row per dose (medication or schedule occurrence), claimed before sending"""
+    STATUS_CHOICES = [
+        ('claimed', 'Claimed'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    medication = models.ForeignKey(
+        Medication, on_delete=models.CASCADE, null=True, blank=True, related_name='reminder_deliveries'
+    )
+    schedule = models.ForeignKey(
+        MedicationSchedule, on_delete=models.CASCADE, null=True, blank=True, related_name='reminder_deliveries'
+    )
+    scheduled_datetime = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='claimed')
+    claimed_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['medication', 'scheduled_datetime'],
+                condition=models.Q(medication__isnull=False),
+                name='unique_reminder_per_dose',
+            ),
+            models.UniqueConstraint(
+                fields=['schedule', 'scheduled_datetime'],
+                condition=models.Q(schedule__isnull=False),
+                name='unique_reminder_per_occurrence',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.medication_id or f'schedule {self.schedule_id}'} @ {self.scheduled_datetime:%Y-%m-%d %H:%M} ({self.status})"
+
+
+class DailyAdherence(models.Model):
+    """
+    Per-user, per-local-day adherence rollup maintained by medications.adherence.
+    Only doses whose scheduled time has passed are counted.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_adherence')
+    date = models.DateField()
+    due = models.PositiveIntegerField(default=0)
+    taken_on_time = models.PositiveIntegerField(default=0)
+    taken_late = models.PositiveIntegerField(default=0)
+    missed = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_daily_adherence'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} {self.date}: {self.taken_on_time + self.taken_late}/{self.due}"
+
+
+class TaskWatermark(models.Model):
+    """How far a periodic task has processed, so a run after downtime resumes where the last one stopped"""
+    name = models.CharField(max_length=50, unique=True)
+    processed_until = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.name}: {self.processed_until:%Y-%m-%d %H:%M}"
+
+
+# Invalidate the user's cached API payloads whenever one of their medications or schedules changes
+@receiver(post_save, sender=Medication)
+@receiver(post_delete, sender=Medication)
+@receiver(post_save, sender=MedicationSchedule)
+@receiver(post_delete, sender=MedicationSchedule)
+def invalidate_medication_api_cache(sender, instance, **kwargs):
+    bump_user_cache_version(instance.user_id)
+    publish_event(instance.user_id, STATS_CHANGED)
@@ -0,0 +1,152 @@
+import base64
+import json
+from datetime import datetime
+from django.conf import settings
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(medication, direction):
+    """
+    Build an opaque cursor token pointing at a medication's (scheduled_datetime, id) key.
+    ``medication`` is a model instance or a ``values()`` dict.
+    """
+    if isinstance(medication, dict):
+        scheduled, pk = medication['scheduled_datetime'], medication['id']
+    else:
+        scheduled, pk = medication.scheduled_datetime, medication.pk
+    payload = json.dumps({
+        't': scheduled.isoformat(),
+        'id': pk,
+        'd': direction,
+    }, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return (scheduled_datetime, id, direction) from a cursor token."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        scheduled = datetime.fromisoformat(payload['t'])
+        pk = int(payload['id'])
+        direction = payload['d']
+    except (ValueError, TypeError, KeyError, OverflowError):
+        raise InvalidCursor('Invalid pagination cursor')
+    # Ids outside a 64-bit integer would fail in the database driver instead
+    if not -2 ** 63 <= pk < 2 ** 63 or direction not in ('next', 'prev'):
+        raise InvalidCursor('Invalid pagination cursor')
+    return scheduled, pk, direction
+
+
+def clamp_page_size(value, default):
+    """Parse a requested page size, falling back to default and capping at MEDICATION_MAX_PAGE_SIZE."""
+    try:
+        page_size = int(value) if value else default
+    except (TypeError, ValueError):
+        page_size = default
+    return max(1, min(page_size, settings.MEDICATION_MAX_PAGE_SIZE))
+
+
+class CursorPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class CursorPaginator:
+    """
+    Keyset paginator ordered on (scheduled_datetime, id).
+    Each page costs one indexed range query regardless of how deep it is.
+    """
+
+    def __init__(self, queryset, page_size, descending=False):
+        self.queryset = queryset
+        self.page_size = page_size
+        self.descending = descending
+
+    def _ordered(self, reverse=False):
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        return self.queryset.order_by(f'{prefix}scheduled_datetime', f'{prefix}id'), descending
+
+    def get_page(self, cursor=None):
+        """Return the page after/before ``cursor``, or the first page. Raises InvalidCursor."""
+        key, direction = self._parse(cursor)
+        if direction == 'prev':
+            page = self._backward_page(list(self._backward_queryset(key)))
+            if page is not None:
+                return page
+            key = None
+        return self._forward_page(list(self._forward_queryset(key)), key)
+
+    async def aget_page(self, cursor=None):
+        """Async counterpart of get_page() for async views."""
+        key, direction = self._parse(cursor)
+        if direction == 'prev':
+            page = self._backward_page([row async for row in self._backward_queryset(key)])
+            if page is not None:
+                return page
+            key = None
+        return self._forward_page([row async for row in self._forward_queryset(key)], key)
+
+    def _parse(self, cursor):
+        if not cursor:
+            return None, 'next'
+        scheduled, pk, direction = decode_cursor(cursor)
+        return (scheduled, pk), direction
+
+    def _seek(self, queryset, key, descending):
+        scheduled, pk = key
+        if descending:
+            return queryset.filter(
+                Q(scheduled_datetime__lt=scheduled) | Q(scheduled_datetime=scheduled, id__lt=pk)
+            )
+        return queryset.filter(
+            Q(scheduled_datetime__gt=scheduled) | Q(scheduled_datetime=scheduled, id__gt=pk)
+        )
+
+    def _forward_queryset(self, key):
+        queryset, descending = self._ordered()
+        if key is not None:
+            queryset = self._seek(queryset, key, descending)
+        return queryset[:self.page_size + 1]
+
+    def _forward_page(self, rows, key):
+        items = rows[:self.page_size]
+
+        next_cursor = encode_cursor(items[-1], 'next') if len(rows) > self.page_size else None
+        previous_cursor = encode_cursor(items[0], 'prev') if key is not None and items else None
+        return CursorPage(items, next_cursor, previous_cursor)
+
+    def _backward_queryset(self, key):
+        queryset, descending = self._ordered(reverse=True)
+        return self._seek(queryset, key, descending)[:self.page_size + 1]
+
+    def _backward_page(self, rows):
+        # None when there is nothing before the cursor; the caller falls back to the first page
+        if not rows:
+            return None
+        items = rows[:self.page_size][::-1]
+
+        previous_cursor = encode_cursor(items[0], 'prev') if len(rows) > self.page_size else None
+        next_cursor = encode_cursor(items[-1], 'next')
+        return CursorPage(items, next_cursor, previous_cursor)
@@ -0,0 +1,125 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import Medication, MedicationSchedule
+
+
+def occurrence_window(now=None):
+    """The rolling [start, end) window in which schedule occurrences are expanded."""
+    if now is None:
+        now = timezone.now()
+    return (
+        now - timedelta(days=settings.MEDICATION_OCCURRENCE_LOOKBACK_DAYS),
+        now + timedelta(days=settings.MEDICATION_OCCURRENCE_WINDOW_DAYS),
+    )
+
+
+def _taken_occurrences(schedules, start, end):
+    return Medication.objects.filter(
+        schedule__in=schedules,
+        scheduled_datetime__gte=start,
+        scheduled_datetime__lt=end,
+    ).values_list('schedule_id', 'scheduled_datetime')
+
+
+def _build_occurrences(schedules, taken, start, end):
+    occurrences = []
+    for schedule in schedules:
+        for when in schedule.occurrence_times(start, end):
+            if (schedule.id, when) in taken:
+                continue
+            occurrences.append(Medication(
+                user_id=schedule.user_id,
+                schedule=schedule,
+                name=schedule.name,
+                dosage=schedule.dosage,
+                scheduled_datetime=when,
+                status='pending',
+            ))
+    occurrences.sort(key=lambda medication: medication.scheduled_datetime)
+    return occurrences
+
+
+def expand_occurrences(schedules, start, end):
+    """
+    Return the not-yet-taken occurrences of ``schedules`` in [start, end) as
+    unsaved pending Medication instances, ordered by scheduled time.
+    """
+    schedules = list(schedules)
+    if not schedules:
+        return []
+    taken = set(_taken_occurrences(schedules, start, end))
+    return _build_occurrences(schedules, taken, start, end)
+
+
+def expand_occurrence_ranges(ranges):
+    """
+    Like expand_occurrences(), with its own [start, end) per schedule:
+    ``ranges`` is a list of (schedule, start, end). One query for all of them.
+    """
+    ranges = [(schedule, start, end) for schedule, start, end in ranges if start < end]
+    if not ranges:
+        return []
+    schedules = [schedule for schedule, _, _ in ranges]
+    taken = set(_taken_occurrences(
+        schedules, min(start for _, start, _ in ranges), max(end for _, _, end in ranges)
+    ))
+    occurrences = []
+    for schedule, start, end in ranges:
+        occurrences.extend(_build_occurrences([schedule], taken, start, end))
+    occurrences.sort(key=lambda medication: medication.scheduled_datetime)
+    return occurrences
+
+
+def _flag_overdue(occurrences, now):
+    for occurrence in occurrences:
+        occurrence.is_overdue = occurrence.scheduled_datetime < now
+    return occurrences
+
+
+def pending_occurrences(user, now=None):
+    """Not-yet-taken occurrences of the user's active schedules in the rolling window."""
+    if now is None:
+        now = timezone.now()
+    start, end = occurrence_window(now)
+    occurrences = expand_occurrences(MedicationSchedule.objects.filter(user=user, is_active=True), start, end)
+    return _flag_overdue(occurrences, now)
+
+
+async def apending_occurrences(user, now=None):
+    """Async counterpart of pending_occurrences() for async views."""
+    if now is None:
+        now = timezone.now()
+    start, end = occurrence_window(now)
+    schedules = [schedule async for schedule in MedicationSchedule.objects.filter(user=user, is_active=True)]
+    if not schedules:
+        return []
+    taken = {row async for row in _taken_occurrences(schedules, start, end)}
+    return _flag_overdue(_build_occurrences(schedules, taken, start, end), now)
+
+
+def take_occurrence(schedule, scheduled_datetime):
+    """
+    Materialise an occurrence as a taken Medication row.
+    Returns the Medication, or None if ``scheduled_datetime`` is not an occurrence of the schedule.
+    """
+    if not schedule.is_occurrence(scheduled_datetime):
+        return None
+
+    try:
+        with transaction.atomic():
+            medication, created = Medication.objects.get_or_create(
+                schedule=schedule,
+                scheduled_datetime=scheduled_datetime,
+                defaults={
+                    'user_id': schedule.user_id,
+                    'name': schedule.name,
+                    'dosage': schedule.dosage,
+                    'status': 'taken',
+                },
+            )
+    except IntegrityError:
+        # Taken concurrently by another request
+        medication = Medication.objects.get(schedule=schedule, scheduled_datetime=scheduled_datetime)
+    return medication
@@ -0,0 +1,148 @@
+"""
+Read-replica routing for the read-only endpoints.
+
+Views decorated with @use_read_replica run their queries against
+DATABASE_READ_REPLICA; everything else, and every write, uses the default
+database. After a client sends a write (any unsafe-method request),
+ReadYourWritesMiddleware sets a cookie that keeps that client's reads on
+the primary for READ_REPLICA_STICKY_SECONDS, so it never reads a replica
+that has not caught up with its own change yet; while pinned, those views
+also bypass the API cache (see reads_pinned()).
+"""
+import functools
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_replica_reads = ContextVar('medications_replica_reads', default=False)
+_pinned_reads = ContextVar('medications_pinned_reads', default=False)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class ReadReplicaRouter:
+    """Send reads inside @use_read_replica views to the replica and all writes to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if settings.DATABASE_READ_REPLICA and _replica_reads.get():
+            return settings.DATABASE_READ_REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Also for instances that were read from the replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives its schema through replication (in development: it is the
+        # primary's SQLite file, or a copy of it)
+        return db != settings.DATABASE_READ_REPLICA
+
+
+def reads_pinned():
+    """Whether the current @use_read_replica view reads from the primary because its client just wrote."""
+    return _pinned_reads.get()
+
+
+def _wants_replica(request):
+    return bool(settings.DATABASE_READ_REPLICA) and settings.READ_REPLICA_PIN_COOKIE not in request.COOKIES
+
+
+def _is_pinned(request):
+    return bool(settings.DATABASE_READ_REPLICA) and settings.READ_REPLICA_PIN_COOKIE in request.COOKIES
+
+
+def _replica_iterator(iterator):
+    """Iterate streaming content with replica routing around each chunk (it is consumed after the view returns)."""
+    iterator = iter(iterator)
+    while True:
+        token = _replica_reads.set(True)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _replica_reads.reset(token)
+        yield chunk
+
+
+def _finish(response):
+    # Template responses and streams query while they render, after the view has returned
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    elif response.streaming and not response.is_async:
+        response.streaming_content = _replica_iterator(response.streaming_content)
+    return response
+
+
+def use_read_replica(view):
+    """Route the view's reads to the replica unless the client wrote recently."""
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if _is_pinned(request):
+                token = _pinned_reads.set(True)
+                try:
+                    return await view(request, *args, **kwargs)
+                finally:
+                    _pinned_reads.reset(token)
+            if not _wants_replica(request):
+                return await view(request, *args, **kwargs)
+            token = _replica_reads.set(True)
+            try:
+                return _finish(await view(request, *args, **kwargs))
+            finally:
+                _replica_reads.reset(token)
+        return wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if _is_pinned(request):
+            token = _pinned_reads.set(True)
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                _pinned_reads.reset(token)
+        if not _wants_replica(request):
+            return view(request, *args, **kwargs)
+        token = _replica_reads.set(True)
+        try:
+            return _finish(view(request, *args, **kwargs))
+        finally:
+            _replica_reads.reset(token)
+    return wrapper
+
+
+class ReadYourWritesMiddleware:
+    """Pin a client's reads to the primary for a short while after each write request."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._pin(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._pin(request, await self.get_response(request))
+
+    def _pin(self, request, response):
+        if settings.DATABASE_READ_REPLICA and request.method not in SAFE_METHODS:
+            response.set_cookie(
+                settings.READ_REPLICA_PIN_COOKIE,
+                '1',
+                max_age=settings.READ_REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
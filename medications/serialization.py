@@ -0,0 +1,74 @@
+"""
+Fast JSON path for the medication API.
+
+Rows are read with ``values()`` (only the serialised columns, no model
+instances) and encoded with orjson when it is installed, falling back to the
+standard library ``json`` module. Datetimes are left as datetime objects
+until encoding time; both encoders emit them in ISO 8601 format.
+"""
+import csv
+import json
+from datetime import date, datetime
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # optional speed-up, see README
+    orjson = None
+
+MEDICATION_FIELDS = ('id', 'name', 'dosage', 'scheduled_datetime', 'status', 'is_overdue', 'created_at')
+MEDICATION_DETAIL_FIELDS = MEDICATION_FIELDS + ('taken_at', 'updated_at')
+
+
+def medication_values(queryset, fields=MEDICATION_FIELDS, now=None):
+    """Return ``queryset`` as dicts holding only ``fields``, with is_overdue computed in SQL."""
+    return queryset.with_overdue(now).values(*fields)
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def stdlib_dumps(data):
+    return json.dumps(data, default=_default, separators=(',', ':')).encode()
+
+
+def dumps(data):
+    """Encode ``data`` to JSON bytes with the fastest available encoder."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return stdlib_dumps(data)
+
+
+class FastJsonResponse(HttpResponse):
+    """JsonResponse counterpart that encodes with ``dumps``."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
+
+
+class _Echo:
+    """File-like object whose write() returns the line, for streaming csv.writer output."""
+
+    def write(self, value):
+        return value
+
+
+def iter_ndjson(rows):
+    """Yield each row as one encoded JSON line."""
+    for row in rows:
+        yield dumps(row) + b'\n'
+
+
+def iter_csv(rows, fields):
+    """Yield a CSV header line followed by one line per row (dicts keyed by ``fields``)."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([
+            row[field].isoformat() if isinstance(row[field], (datetime, date)) else row[field]
+            for field in fields
+        ])
@@ -0,0 +1,50 @@
+from django.db.models import Count, Q
+from django.utils import timezone
+from .models import Medication
+
+
+def _counters(now, today):
+    pending = Q(status='pending')
+    return {
+        'total': Count('id'),
+        'pending': Count('id', filter=pending),
+        'taken': Count('id', filter=Q(status='taken')),
+        'overdue': Count('id', filter=pending & Q(scheduled_datetime__lt=now)),
+        'today': Count('id', filter=pending & Q(scheduled_datetime__date=today)),
+    }
+
+
+def _add_occurrences(counts, occurrences, now, today):
+    for occurrence in occurrences or ():
+        counts['total'] += 1
+        counts['pending'] += 1
+        if occurrence.scheduled_datetime < now:
+            counts['overdue'] += 1
+        if timezone.localdate(occurrence.scheduled_datetime) == today:
+            counts['today'] += 1
+    return counts
+
+
+def get_medication_statistics(user, now=None, occurrences=None):
+    """
+    Compute all dashboard counters for a user in a single aggregate query.
+    Returns a dict with total, pending, taken, overdue and today counts.
+    ``occurrences`` are not-yet-taken schedule occurrences (see
+    medications.recurrence) to count as pending doses on top of the stored rows.
+    """
+    if now is None:
+        now = timezone.now()
+    today = timezone.localdate(now)
+
+    counts = Medication.objects.filter(user=user).aggregate(**_counters(now, today))
+    return _add_occurrences(counts, occurrences, now, today)
+
+
+async def aget_medication_statistics(user, now=None, occurrences=None):
+    """Async counterpart of get_medication_statistics() for async views."""
+    if now is None:
+        now = timezone.now()
+    today = timezone.localdate(now)
+
+    counts = await Medication.objects.filter(user=user).aaggregate(**_counters(now, today))
+    return _add_occurrences(counts, occurrences, now, today)
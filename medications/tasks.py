@@ -1,67 +1,266 @@
 from celery import shared_task
-from django.core.mail import send_mail, EmailMultiAlternatives
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
+from django.core.mail import send_mail, EmailMultiAlternatives, get_connection
 from django.conf import settings
+from django.db.models import Q
 from django.utils import timezone
+from datetime import timedelta
+from .models import Medication, MedicationSchedule
+from .emails import render_reminder
+from .ledger import claim_reminder, mark_reminder_sent, release_reminder
+from .adherence import refresh_due_adherence
+from .events import publish_event, DOSE_DUE
 import logging
 
 logger = logging.getLogger(__name__)
 
+def build_reminder_email(user_email, medication_name, scheduled_datetime, dosage="", connection=None, **kwargs):
+    """
+    Render the HTML/text reminder for one medication and return it as an
+    EmailMultiAlternatives bound to ``connection`` (if given)
+    """
+    subject = f"💊 Medication Reminder: {medication_name}"
+    
+    # Get current time for comparison
+    current_time = timezone.now()
+    
+    # Parse scheduled datetime and make it timezone-aware
+    if 'Z' in scheduled_datetime:
+        # Handle UTC time
+        scheduled_time = timezone.datetime.fromisoformat(scheduled_datetime.replace('Z', '+00:00'))
+    else:
+        # Handle local time - assume it's in the current timezone
+        naive_scheduled = timezone.datetime.fromisoformat(scheduled_datetime)
+        scheduled_time = timezone.make_aware(naive_scheduled, timezone.get_current_timezone())
+    
+    # Check if medication is overdue
+    is_overdue = current_time > scheduled_time
+    
+    # Context for the email template
+    context = {
+        'medication_name': medication_name,
+        'dosage': dosage,
+        'scheduled_datetime': scheduled_time.strftime('%B %d, %Y at %I:%M %p'),
+        'current_time': current_time.strftime('%B %d, %Y at %I:%M %p'),
+        'is_overdue': is_overdue,
+    }
+    
+    # Render HTML and plain text versions
+    html_message, text_message = render_reminder(context)
+    
+    # Create email with both HTML and text versions
+    email = EmailMultiAlternatives(
+        subject=subject,
+        body=text_message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[user_email],
+        connection=connection,
+    )
+    email.attach_alternative(html_message, "text/html")
+    return email
+
+
 @shared_task(bind=True)
-def send_email_reminder(self, user_email, medication_name, medication_id, scheduled_datetime, dosage=""):
+def send_email_reminder(self, user_email, medication_name, medication_id, scheduled_datetime, dosage="", schedule_id=None):
     """
-    Send HTML email reminder for medication
+    Send HTML email reminder for medication (or, with schedule_id, a schedule occurrence)
     """
+    # Claim the dose in the ledger so retries and concurrent workers never send it twice
+    delivery = claim_reminder(medication_id, scheduled_datetime, schedule_id)
+    if delivery is None:
+        logger.info(f"Skipping reminder for medication {medication_id}: already sent or superseded")
+        return f"Reminder for {medication_name} skipped"
+    
     try:
-        subject = f"💊 Medication Reminder: {medication_name}"
-        
-        # Get current time for comparison
-        current_time = timezone.now()
-        
-        # Parse scheduled datetime and make it timezone-aware
-        if 'Z' in scheduled_datetime:
-            # Handle UTC time
-            scheduled_time = timezone.datetime.fromisoformat(scheduled_datetime.replace('Z', '+00:00'))
-        else:
-            # Handle local time - assume it's in the current timezone
-            naive_scheduled = timezone.datetime.fromisoformat(scheduled_datetime)
-            scheduled_time = timezone.make_aware(naive_scheduled, timezone.get_current_timezone())
-        
-        # Check if medication is overdue
-        is_overdue = current_time > scheduled_time
-        
-        # Context for the email template
-        context = {
-            'medication_name': medication_name,
-            'dosage': dosage,
-            'scheduled_datetime': scheduled_time.strftime('%B %d, %Y at %I:%M %p'),
-            'current_time': current_time.strftime('%B %d, %Y at %I:%M %p'),
-            'is_overdue': is_overdue,
-        }
-        
-        # Render HTML email template
-        html_message = render_to_string('emails/medication_reminder.html', context)
-        
-        # Create plain text version
-        text_message = strip_tags(html_message)
-        
-        # Create email with both HTML and text versions
-        email = EmailMultiAlternatives(
-            subject=subject,
-            body=text_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[user_email]
-        )
-        email.attach_alternative(html_message, "text/html")
+        email = build_reminder_email(user_email, medication_name, scheduled_datetime, dosage)
         
         # Send email
         email.send()
+        mark_reminder_sent(delivery)
         
         logger.info(f"HTML email reminder sent successfully for medication {medication_name} to {user_email}")
         return f"HTML email sent to {user_email} for {medication_name}"
         
     except Exception as e:
+        release_reminder(delivery)
         logger.error(f"Failed to send email reminder: {str(e)}")
         self.retry(countdown=60, max_retries=3)  # Retry after 1 minute, max 3 times
         raise e
+
+
+@shared_task
+def send_email_reminders_batch(reminders):
+    """
+    Send many reminders (send_email_reminder kwargs dicts) reusing one SMTP
+    connection per REMINDER_EMAIL_BATCH_SIZE messages. A failed message does not
+    stop the batch; it is handed to send_email_reminder, which retries on its own.
+    Reminders already sent or superseded (see claim_reminder) are skipped.
+    """
+    batch_size = settings.REMINDER_EMAIL_BATCH_SIZE
+    sent = 0
+    skipped = 0
+    failed = []
+    
+    for start in range(0, len(reminders), batch_size):
+        chunk = reminders[start:start + batch_size]
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            logger.error(f"Failed to open email connection: {str(e)}")
+            failed.extend(chunk)
+            continue
+        
+        for position, reminder in enumerate(chunk):
+            delivery = claim_reminder(
+                reminder['medication_id'], reminder['scheduled_datetime'], reminder.get('schedule_id')
+            )
+            if delivery is None:
+                skipped += 1
+                continue
+            try:
+                build_reminder_email(connection=connection, **reminder).send()
+                mark_reminder_sent(delivery)
+                sent += 1
+            except Exception as e:
+                release_reminder(delivery)
+                logger.error(f"Failed to send email reminder to {reminder.get('user_email')}: {str(e)}")
+                failed.append(reminder)
+                # The session may be unusable after an SMTP error; start a fresh one
+                connection.close()
+                try:
+                    connection.open()
+                except Exception as e:
+                    logger.error(f"Failed to reopen email connection: {str(e)}")
+                    failed.extend(chunk[position + 1:])
+                    break
+        connection.close()
+    
+    for reminder in failed:
+        send_email_reminder.apply_async(kwargs=reminder, countdown=60)
+    
+    logger.info(
+        f"Batch email reminders: {sent} sent, {skipped} skipped, {len(failed)} handed off for retry"
+    )
+    return sent
+
+
+def reminder_kwargs(medication):
+    """Build the send_email_reminder kwargs for a medication (user must be loaded)."""
+    return {
+        'user_email': medication.user.email,
+        'medication_name': medication.name,
+        'medication_id': medication.id,
+        # send_email_reminder reads this as local time
+        'scheduled_datetime': timezone.localtime(medication.scheduled_datetime).strftime('%Y-%m-%d %H:%M'),
+        'dosage': medication.dosage,
+    }
+
+
+def occurrence_reminder_kwargs(schedule, scheduled_datetime):
+    """Build the send_email_reminder kwargs for a schedule occurrence (user must be loaded)."""
+    return {
+        'user_email': schedule.user.email,
+        'medication_name': schedule.name,
+        'medication_id': None,
+        'schedule_id': schedule.id,
+        'scheduled_datetime': timezone.localtime(scheduled_datetime).strftime('%Y-%m-%d %H:%M'),
+        'dosage': schedule.dosage,
+    }
+
+
+def dose_due_data(reminder):
+    """The dose_due event payload for send_email_reminder kwargs (without the address)."""
+    return {key: value for key, value in reminder.items() if key != 'user_email'}
+
+
+def due_occurrence_reminders(now, window_start):
+    """
+    Claim the due occurrences of recurring schedules by advancing each
+    schedule's next_reminder_at past ``now``, and return their reminder kwargs.
+    """
+    reminders = []
+    schedules = MedicationSchedule.objects.filter(
+        is_active=True, next_reminder_at__lte=now
+    ).select_related('user')
+
+    for schedule in schedules:
+        after = now + timedelta(microseconds=1)
+        # Only the dispatcher that moves next_reminder_at on sends these occurrences
+        advanced = MedicationSchedule.objects.filter(
+            pk=schedule.pk, next_reminder_at=schedule.next_reminder_at
+        ).update(next_reminder_at=schedule.next_occurrence(after))
+        if not advanced:
+            continue
+        start = max(schedule.next_reminder_at, window_start)
+        for when in schedule.occurrence_times(start, after):
+            reminder = occurrence_reminder_kwargs(schedule, when)
+            publish_event(schedule.user_id, DOSE_DUE, dose_due_data(reminder))
+            reminders.append(reminder)
+    return reminders
+
+
+@shared_task
+def dispatch_due_reminders():
+    """
+    Periodic task (see CELERY_BEAT_SCHEDULE) that fans out reminders for pending
+    medications and recurring schedule occurrences that have come due, so future
+    reminders live only in the database
+    """
+    now = timezone.now()
+    batch_size = settings.REMINDER_DISPATCH_BATCH_SIZE
+    window_start = now - timedelta(minutes=settings.REMINDER_DISPATCH_LOOKBACK_MINUTES)
+
+    # Doses that came due within the window, and doses created or rescheduled since the
+    # window opened whose time had already passed (they get their reminder right away)
+    due = Medication.objects.filter(
+        Q(scheduled_datetime__gte=window_start) | Q(updated_at__gte=window_start),
+        status='pending',
+        reminder_dispatched_at__isnull=True,
+        scheduled_datetime__lte=now,
+    ).order_by('scheduled_datetime')
+
+    dispatched = 0
+    while True:
+        batch_ids = list(due.values_list('id', flat=True)[:batch_size])
+        if not batch_ids:
+            break
+
+        # Claim the batch; rows another dispatcher claimed first are skipped
+        Medication.objects.filter(
+            id__in=batch_ids, reminder_dispatched_at__isnull=True
+        ).update(reminder_dispatched_at=now)
+        claimed = Medication.objects.filter(
+            id__in=batch_ids, reminder_dispatched_at=now
+        ).select_related('user')
+
+        reminders = []
+        for medication in claimed:
+            reminder = reminder_kwargs(medication)
+            publish_event(medication.user_id, DOSE_DUE, dose_due_data(reminder))
+            reminders.append(reminder)
+        if reminders:
+            send_email_reminders_batch.apply_async(kwargs={'reminders': reminders})
+            dispatched += len(reminders)
+
+    occurrence_reminders = due_occurrence_reminders(now, window_start)
+    for start in range(0, len(occurrence_reminders), batch_size):
+        send_email_reminders_batch.apply_async(
+            kwargs={'reminders': occurrence_reminders[start:start + batch_size]}
+        )
+    dispatched += len(occurrence_reminders)
+
+    if dispatched:
+        logger.info(f"Dispatched {dispatched} due medication reminders")
+    return dispatched
+
+
+@shared_task
+def refresh_adherence_rollups():
+    """
+    Periodic task (see CELERY_BEAT_SCHEDULE) that recounts the adherence
+    rollup days of doses whose scheduled time has just passed
+    """
+    refreshed = refresh_due_adherence()
+    if refreshed:
+        logger.info(f"Refreshed adherence rollups for {refreshed} users")
+    return refreshed
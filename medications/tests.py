@@ -0,0 +1,107 @@
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from .api_cache import cached_api_payload
+from .models import Medication
+from .routing import ReadReplicaRouter, ReadYourWritesMiddleware, reads_pinned, use_read_replica
+
+
+class MarkAsTakenTests(TestCase):
+
+    def setUp(self):
+        # Tests roll back and reuse user ids, so start without cached users
+        caches[settings.ACCOUNTS_USER_CACHE_ALIAS].clear()
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'a-Strong-passw0rd')
+        self.medication = Medication.objects.create(
+            user=self.user, name='Aspirin', dosage='1 tablet',
+            scheduled_datetime=timezone.now() - timedelta(minutes=5),
+        )
+        self.client.force_login(self.user, backend='accounts.backends.EmailBackend')
+        self.url = reverse('medications:mark_as_taken', args=[self.medication.pk])
+
+    def test_mark_as_taken_query_count(self):
+        # Session, user with profile, the dose's name and status, and the conditional UPDATE
+        with self.assertNumQueries(4):
+            response = self.client.post(self.url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        self.assertEqual(response.json()['message'], 'Aspirin marked as taken!')
+        self.medication.refresh_from_db()
+        self.assertEqual(self.medication.status, 'taken')
+        self.assertIsNotNone(self.medication.taken_at)
+
+    def test_already_taken(self):
+        self.client.post(self.url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        response = self.client.post(self.url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.json()['message'], 'Medication was already marked as taken.')
+
+    def test_other_users_medication_is_not_found(self):
+        other = User.objects.create_user('bob', 'bob@example.com', 'a-Strong-passw0rd')
+        self.client.force_login(other, backend='accounts.backends.EmailBackend')
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(DATABASE_READ_REPLICA='replica')
+class ReadReplicaRoutingTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = ReadReplicaRouter()
+        self.factory = RequestFactory()
+
+    def run_view(self, request):
+        seen = {}
+
+        @use_read_replica
+        def view(request):
+            seen['read_db'] = self.router.db_for_read(Medication)
+            seen['write_db'] = self.router.db_for_write(Medication)
+            seen['pinned'] = reads_pinned()
+            return HttpResponse()
+
+        view(request)
+        return seen
+
+    def test_reads_go_to_the_replica_only_inside_decorated_views(self):
+        self.assertIsNone(self.router.db_for_read(Medication))
+        seen = self.run_view(self.factory.get('/'))
+        self.assertEqual(seen, {'read_db': 'replica', 'write_db': 'default', 'pinned': False})
+
+    def test_pin_cookie_keeps_reads_on_the_primary(self):
+        request = self.factory.get('/')
+        request.COOKIES[settings.READ_REPLICA_PIN_COOKIE] = '1'
+        seen = self.run_view(request)
+        self.assertEqual(seen, {'read_db': None, 'write_db': 'default', 'pinned': True})
+        self.assertFalse(reads_pinned())
+
+    def test_migrations_skip_the_replica(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'medications'))
+        self.assertTrue(self.router.allow_migrate('default', 'medications'))
+
+    def test_middleware_pins_after_writes_only(self):
+        middleware = ReadYourWritesMiddleware(lambda request: HttpResponse())
+        self.assertIn(settings.READ_REPLICA_PIN_COOKIE, middleware(self.factory.post('/')).cookies)
+        self.assertNotIn(settings.READ_REPLICA_PIN_COOKIE, middleware(self.factory.get('/')).cookies)
+        with override_settings(DATABASE_READ_REPLICA=None):
+            self.assertNotIn(settings.READ_REPLICA_PIN_COOKIE, middleware(self.factory.post('/')).cookies)
+
+    @override_settings(MEDICATION_API_CACHE_TIMEOUT=60)
+    def test_pinned_requests_bypass_the_api_cache(self):
+        caches[settings.MEDICATION_API_CACHE_ALIAS].clear()
+        builds = []
+
+        @use_read_replica
+        def view(request):
+            payload = cached_api_payload(1, 'test', lambda: builds.append(1) or {'n': len(builds)})
+            return HttpResponse(str(payload['n']))
+
+        pinned = self.factory.get('/')
+        pinned.COOKIES[settings.READ_REPLICA_PIN_COOKIE] = '1'
+        self.assertEqual(view(pinned).content, b'1')
+        self.assertEqual(view(self.factory.get('/')).content, b'2')
+        self.assertEqual(view(self.factory.get('/')).content, b'2')
+        self.assertEqual(view(pinned).content, b'3')
@@ -1,8 +1,12 @@
+from django.conf import settings
 from django.urls import path
-from . import views, api_views
+from . import views, api_views, async_api_views
 
 app_name = 'medications'
 
+# Read endpoints served by native async views (for ASGI deployments) or the sync ones
+read_api_views = async_api_views if settings.MEDICATION_ASYNC_API_VIEWS else api_views
+
 urlpatterns = [
     # Web views (Class-based)
     path('', views.MedicationListView.as_view(), name='medication_list'),
@@ -10,9 +14,19 @@ urlpatterns = [
     path('<int:pk>/edit/', views.MedicationUpdateView.as_view(), name='edit_medication'),
     path('<int:pk>/mark-taken/', views.MedicationMarkAsTakenView.as_view(), name='mark_as_taken'),
     path('<int:pk>/delete/', views.MedicationDeleteView.as_view(), name='delete_medication'),
+    path('schedules/add/', views.MedicationScheduleCreateView.as_view(), name='add_schedule'),
+    path('schedules/<int:pk>/stop/', views.MedicationScheduleStopView.as_view(), name='stop_schedule'),
+    path('schedules/<int:pk>/take/<int:timestamp>/', views.OccurrenceMarkAsTakenView.as_view(), name='take_occurrence'),
     
     # API endpoints (for future mobile app integration)
-    path('api/list/', api_views.api_medications_list, name='api_medications_list'),
-    path('api/detail/<int:pk>/', api_views.api_medication_detail, name='api_medication_detail'),
-    path('api/statistics/', api_views.api_statistics, name='api_statistics'),
+    path('api/list/', read_api_views.api_medications_list, name='api_medications_list'),
+    path('api/detail/<int:pk>/', read_api_views.api_medication_detail, name='api_medication_detail'),
+    path('api/statistics/', read_api_views.api_statistics, name='api_statistics'),
+    path('api/events/', async_api_views.api_events, name='api_events'),
+    path('api/occurrences/', api_views.api_occurrences, name='api_occurrences'),
+    path('api/export/', api_views.api_export, name='api_export'),
+    path('api/adherence/', api_views.api_adherence, name='api_adherence'),
+    path('api/bulk/create/', api_views.api_bulk_create, name='api_bulk_create'),
+    path('api/bulk/mark-taken/', api_views.api_bulk_mark_taken, name='api_bulk_mark_taken'),
+    path('api/bulk/delete/', api_views.api_bulk_delete, name='api_bulk_delete'),
 ]
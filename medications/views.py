@@ -1,6 +1,6 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
 from django.utils import timezone
 from django.views.generic import ListView, CreateView, UpdateView, View
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -8,51 +8,81 @@ from django.utils.decorators import method_decorator
 from django.views.decorators.http import require_POST
 from django.urls import reverse_lazy
 from django.core.paginator import Paginator
-from .models import Medication
-from .forms import MedicationForm
-from .tasks import send_email_reminder
+from django.conf import settings
+from datetime import datetime, timezone as dt_timezone
+from .models import Medication, MedicationSchedule
+from .forms import MedicationForm, MedicationScheduleForm
+from .statistics import get_medication_statistics
+from .pagination import CursorPaginator, InvalidCursor
+from .recurrence import pending_occurrences, take_occurrence
+from .adherence import refresh_adherence_for
+from .api_cache import bump_user_cache_version
+from .events import publish_event, MARKED_TAKEN, STATS_CHANGED
+from .routing import use_read_replica
 
 
 class MedicationListView(LoginRequiredMixin, ListView):
     model = Medication
     template_name = 'medications/medication_list.html'
     context_object_name = 'medications'
-    paginate_by = 5  # Show 5 medications per page
+    page_size = 5  # Show 5 medications per page
+    
+    @method_decorator(use_read_replica)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
     
     def get_queryset(self):
         return Medication.objects.filter(user=self.request.user)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        medications = self.get_queryset()
+        # One shared "now" for the overdue flags, counters and scheduled doses
+        now = timezone.now()
+        medications = self.get_queryset().with_overdue(now)
         pending_medications = medications.filter(status='pending')
         taken_medications = medications.filter(status='taken')
         
-        # Calculate statistics
-        now = timezone.now()
-        overdue_medications = pending_medications.filter(scheduled_datetime__lt=now)
-        today_medications = pending_medications.filter(
-            scheduled_datetime__date=now.date()
-        )
+        # Upcoming doses of recurring schedules are expanded on the fly, not stored
+        occurrences = pending_occurrences(self.request.user, now=now)
         
-        # Separate pagination for pending and taken medications
-        pending_paginator = Paginator(pending_medications, self.paginate_by)
-        taken_paginator = Paginator(taken_medications, self.paginate_by)
+        # Calculate statistics in a single aggregate query
+        stats = get_medication_statistics(self.request.user, now=now, occurrences=occurrences)
         
-        pending_page = self.request.GET.get('pending_page', 1)
-        taken_page = self.request.GET.get('taken_page', 1)
+        # Separate pagination for pending and taken medications
+        pagination_mode = settings.MEDICATION_PAGINATION_MODE
+        if pagination_mode == 'cursor':
+            pending_page = self.get_cursor_page(pending_medications, 'pending_cursor')
+            taken_page = self.get_cursor_page(taken_medications, 'taken_cursor')
+        else:
+            pending_paginator = Paginator(pending_medications, self.page_size)
+            taken_paginator = Paginator(taken_medications, self.page_size)
+            pending_page = pending_paginator.get_page(self.request.GET.get('pending_page', 1))
+            taken_page = taken_paginator.get_page(self.request.GET.get('taken_page', 1))
         
         context.update({
-            'pending_medications': pending_paginator.get_page(pending_page),
-            'taken_medications': taken_paginator.get_page(taken_page),
-            'total_medications': medications.count(),
-            'pending_count': pending_medications.count(),
-            'taken_count': taken_medications.count(),
-            'overdue_count': overdue_medications.count(),
-            'today_count': today_medications.count(),
+            'pending_medications': pending_page,
+            'taken_medications': taken_page,
+            'pagination_mode': pagination_mode,
+            'scheduled_doses': occurrences[:self.page_size],
+            'scheduled_doses_count': len(occurrences),
+            'pending_medications_count': stats['pending'] - len(occurrences),
+            'schedules': MedicationSchedule.objects.filter(user=self.request.user, is_active=True),
+            'total_medications': stats['total'],
+            'pending_count': stats['pending'],
+            'taken_count': stats['taken'],
+            'overdue_count': stats['overdue'],
+            'today_count': stats['today'],
             'current_time': now,
         })
         return context
+    
+    def get_cursor_page(self, queryset, cursor_param):
+        paginator = CursorPaginator(queryset, self.page_size)
+        try:
+            return paginator.get_page(self.request.GET.get(cursor_param))
+        except InvalidCursor:
+            # Stale or tampered cursor - start from the first page
+            return paginator.get_page()
 
 
 class MedicationCreateView(LoginRequiredMixin, CreateView):
@@ -68,20 +98,9 @@ class MedicationCreateView(LoginRequiredMixin, CreateView):
     
     def form_valid(self, form):
         form.instance.user = self.request.user
+        # The email reminder is sent by the dispatch_due_reminders periodic task
         response = super().form_valid(form)
         
-        # Schedule Celery task for email reminder
-        send_email_reminder.apply_async(
-            kwargs={
-                'user_email': self.request.user.email,
-                'medication_name': self.object.name,
-                'medication_id': self.object.id,
-                'scheduled_datetime': self.object.scheduled_datetime.strftime('%Y-%m-%d %H:%M'),
-                'dosage': self.object.dosage
-            },
-            eta=self.object.scheduled_datetime
-        )
-        
         messages.success(self.request, f'Medication "{self.object.name}" added successfully! Reminder scheduled for {self.object.scheduled_datetime.strftime("%Y-%m-%d %H:%M")}.')
         return response
 
@@ -101,18 +120,12 @@ class MedicationUpdateView(LoginRequiredMixin, UpdateView):
         return Medication.objects.filter(user=self.request.user)
     
     def form_valid(self, form):
-        response = super().form_valid(form)
-        
         # Reschedule email reminder if datetime changed
-        send_email_reminder.apply_async(
-            kwargs={
-                'user_email': self.request.user.email,
-                'medication_name': self.object.name,
-                'medication_id': self.object.id,
-                'scheduled_datetime': self.object.scheduled_datetime.strftime('%Y-%m-%d %H:%M'),
-                'dosage': self.object.dosage
-            },
-            eta=self.object.scheduled_datetime
+        if 'scheduled_datetime' in form.changed_data:
+            form.instance.reminder_dispatched_at = None
+        response = super().form_valid(form)
+        refresh_adherence_for(
+            self.object.user_id, [form.initial.get('scheduled_datetime'), self.object.scheduled_datetime]
         )
         
         messages.success(self.request, f'Medication "{self.object.name}" updated successfully!')
@@ -126,14 +139,27 @@ class MedicationMarkAsTakenView(LoginRequiredMixin, View):
         return super().dispatch(*args, **kwargs)
     
     def post(self, request, pk):
-        medication = get_object_or_404(Medication, pk=pk, user=request.user)
-        medication.status = 'taken'
-        medication.save()
+        # Read only the name and status, then one conditional UPDATE so a dose is never
+        # taken twice; refresh_adherence_rollups picks the dose up by taken_at
+        medication = Medication.objects.filter(pk=pk, user=request.user)
+        row = medication.values_list('name', 'status').first()
+        if row is None:
+            raise Http404('No medication matches the given query.')
+        name, status = row
+        if status == 'taken' or not medication.mark_taken():
+            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                return JsonResponse({'status': 'success', 'message': 'Medication was already marked as taken.'})
+            messages.info(request, 'Medication was already marked as taken.')
+            return redirect('medications:medication_list')
+        # The UPDATE sends no post_save signal
+        bump_user_cache_version(request.user.id)
+        publish_event(request.user.id, MARKED_TAKEN, {'medication_ids': [pk]})
+        publish_event(request.user.id, STATS_CHANGED)
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            return JsonResponse({'status': 'success', 'message': f'{medication.name} marked as taken!'})
+            return JsonResponse({'status': 'success', 'message': f'{name} marked as taken!'})
         
-        messages.success(request, f'{medication.name} marked as taken!')
+        messages.success(request, f'{name} marked as taken!')
         return redirect('medications:medication_list')
 
 
@@ -147,9 +173,84 @@ class MedicationDeleteView(LoginRequiredMixin, View):
         medication = get_object_or_404(Medication, pk=pk, user=request.user)
         medication_name = medication.name
         medication.delete()
+        refresh_adherence_for(request.user.id, [medication.scheduled_datetime])
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({'status': 'success', 'message': f'{medication_name} deleted successfully!'})
         
         messages.success(request, f'{medication_name} deleted successfully!')
         return redirect('medications:medication_list')
+
+
+class MedicationScheduleCreateView(LoginRequiredMixin, CreateView):
+    model = MedicationSchedule
+    form_class = MedicationScheduleForm
+    template_name = 'medications/schedule_form.html'
+    success_url = reverse_lazy('medications:medication_list')
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['title'] = 'Add Recurring Schedule'
+        return context
+    
+    def form_valid(self, form):
+        form.instance.user = self.request.user
+        # Occurrences are expanded on demand; reminders come from dispatch_due_reminders
+        response = super().form_valid(form)
+        
+        messages.success(self.request, f'Recurring schedule "{self.object.name}" added successfully!')
+        return response
+
+
+class MedicationScheduleStopView(LoginRequiredMixin, View):
+    
+    @method_decorator(require_POST)
+    def dispatch(self, *args, **kwargs):
+        return super().dispatch(*args, **kwargs)
+    
+    def post(self, request, pk):
+        schedule = get_object_or_404(MedicationSchedule, pk=pk, user=request.user, is_active=True)
+        # Deactivate rather than delete so taken occurrences keep their history
+        schedule.is_active = False
+        schedule.save()
+        
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return JsonResponse({'status': 'success', 'message': f'{schedule.name} schedule stopped.'})
+        
+        messages.success(request, f'{schedule.name} schedule stopped.')
+        return redirect('medications:medication_list')
+
+
+class OccurrenceMarkAsTakenView(LoginRequiredMixin, View):
+    
+    @method_decorator(require_POST)
+    def dispatch(self, *args, **kwargs):
+        return super().dispatch(*args, **kwargs)
+    
+    def post(self, request, pk, timestamp):
+        schedule = get_object_or_404(MedicationSchedule, pk=pk, user=request.user)
+        try:
+            scheduled_datetime = datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            # Outside the datetime range, so not one of the schedule's doses
+            raise Http404('No scheduled dose at that time.')
+        medication = take_occurrence(schedule, scheduled_datetime)
+        if medication is not None:
+            refresh_adherence_for(request.user.id, [scheduled_datetime])
+            publish_event(request.user.id, MARKED_TAKEN, {
+                'medication_ids': [medication.id],
+                'schedule_id': schedule.id,
+                'scheduled_datetime': scheduled_datetime.isoformat(),
+            })
+        
+        if medication is None:
+            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                return JsonResponse({'status': 'error', 'message': 'Not a scheduled dose.'}, status=404)
+            messages.error(request, 'That dose is not part of the schedule.')
+            return redirect('medications:medication_list')
+        
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return JsonResponse({'status': 'success', 'message': f'{medication.name} marked as taken!'})
+        
+        messages.success(request, f'{medication.name} marked as taken!')
+        return redirect('medications:medication_list')
@@ -0,0 +1,7 @@
+@echo off
+echo Starting Celery Beat for Medication Reminder...
+echo Make sure Redis server is running first!
+echo.
+call medication_env\Scripts\activate
+celery -A medication_reminder beat -l info
+pause